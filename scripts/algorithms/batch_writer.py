@@ -0,0 +1,88 @@
+# Import necessary libraries
+import logging  # Leveled logging
+import time  # Module for time-related functions
+from algorithms.metrics import metrics  # Firebase call counters
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500  # Maximum number of operations in a Firestore batch
+
+# Raised when a batch could not be committed after every retry, its operations stay queued
+class BatchWriteError(Exception):
+    pass
+
+# Define BatchWriter class
+class BatchWriter:
+    # Constructor with the Firestore client and the flush policy
+    def __init__(self, db_firestore, batch_size=MAX_BATCH_SIZE, flush_interval=5.0, max_retries=3, retry_delay=0.5):
+        self.db_firestore = db_firestore  # Firestore client
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)  # Operations per batch
+        self.flush_interval = flush_interval  # Seconds after which a partial batch is committed
+        self.max_retries = max_retries  # Attempts before a batch is given up
+        self.retry_delay = retry_delay  # Seconds before the first retry, doubled at every attempt
+        self.operations = []  # Operations waiting to be committed
+        self.first_pending = None  # Time of the oldest waiting operation
+        self.reset_stats()
+
+    # Method to reset the write counters of the cycle
+    def reset_stats(self):
+        self.writes = 0     # Committed operations
+        self.batches = 0    # Committed batches
+        self.failed = 0     # Operations of batches given up, kept for the next flush
+        self.retries = 0    # Retried batches
+        self.latency = 0.0  # Seconds spent committing
+
+    # Method to queue a document write, committing when the batch is full or old enough
+    def set(self, doc_ref, data, merge=False):
+        if not self.operations:
+            self.first_pending = time.monotonic()
+        self.operations.append((doc_ref, data, merge))
+        if len(self.operations) >= self.batch_size or time.monotonic() - self.first_pending >= self.flush_interval:
+            self.flush()
+
+    # Method to commit every waiting operation, raising BatchWriteError when a batch is given up.
+    # The operations of the failed batch and the ones after it are kept and retried by the next flush
+    def flush(self):
+        while self.operations:
+            chunk = self.operations[:self.batch_size]
+            if not self.commit(chunk):
+                self.first_pending = time.monotonic()
+                raise BatchWriteError(f"{len(self.operations)} operations not committed after {self.max_retries} attempts")
+            self.operations = self.operations[self.batch_size:]
+        self.first_pending = None
+
+    # Method to commit a chunk of operations in one batch, retrying on failure
+    def commit(self, chunk):
+        delay = self.retry_delay
+        for attempt in range(self.max_retries):
+            batch = self.db_firestore.batch()
+            for doc_ref, data, merge in chunk:
+                batch.set(doc_ref, data, merge=merge)
+            start = time.monotonic()
+            try:
+                metrics.firebase_call("firestore_commit", [data for doc_ref, data, merge in chunk])
+                batch.commit()
+            except Exception as e:
+                self.latency += time.monotonic() - start
+                logger.warning("Batch commit failed: %s", e)
+                if attempt + 1 < self.max_retries:
+                    self.retries += 1
+                    time.sleep(delay)
+                    delay *= 2
+                continue
+            self.latency += time.monotonic() - start
+            self.writes += len(chunk)
+            self.batches += 1
+            return True
+        self.failed += len(chunk)
+        return False
+
+    # Method to describe the counters of the cycle
+    def report(self):
+        return {
+            "writes": self.writes,
+            "batches": self.batches,
+            "failed": self.failed,
+            "retries": self.retries,
+            "latency_ms": round(self.latency * 1000, 1)
+        }
@@ -0,0 +1,130 @@
+# Import necessary libraries
+import math  # Math functions
+import numpy as np  # Numerical computing library
+from algorithms.metrics import metrics  # Counters of the dropped and filled samples
+
+SENSORS = ("heartrateSensor", "skinTemperatureSensor", "edaSensor")  # Sensor fields, interpolated in time
+LOCATION = ("latitude", "longitude")  # GPS fields, interpolated in time as well
+FIELDS = SENSORS + LOCATION
+COLUMNS = ("timestamp",) + FIELDS  # Columns of the table of the records
+
+# Function to read a field of a record as a float, NaN when missing or not a number
+def to_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return value
+
+# Define SampleCleaner class
+class SampleCleaner:
+    # Constructor with the optional resampling period and the longest gap filled, in milliseconds
+    def __init__(self, resample_period=None, max_gap=10000):
+        self.resample_period = resample_period  # Period of the resampled samples, None keeps the original ones
+        self.max_gap = max_gap  # Longest gap between valid readings that is interpolated
+        self.last_seen = {}  # Last timestamp seen of each account
+        self.carry = {}  # Last valid (timestamp, value) of each field of each account
+        self.last_emitted = {}  # Last resampled timestamp of each account
+
+    # Method to forget an account
+    def forget(self, account):
+        self.last_seen.pop(account, None)
+        self.carry.pop(account, None)
+        self.last_emitted.pop(account, None)
+
+    # Method to tell which timestamps are close enough to the known ones to be interpolated: inside a gap
+    # no longer than max_gap, or within max_gap of the first or last known timestamp
+    def bridged(self, known_t, timestamps):
+        position = np.searchsorted(known_t, timestamps)
+        before = known_t[np.clip(position - 1, 0, len(known_t) - 1)]
+        after = known_t[np.clip(position, 0, len(known_t) - 1)]
+        exact = after == timestamps
+        span = np.where(position == 0, after - timestamps, np.where(position == len(known_t), timestamps - before, after - before))
+        return exact | (span <= self.max_gap)
+
+    # Method to fill the missing values of a column from the valid readings around them
+    def fill(self, timestamps, values, carry=None):
+        valid = np.isfinite(values)
+        known_t, known_v = timestamps[valid], values[valid]
+        if carry is not None:
+            known_t = np.concatenate(([carry[0]], known_t))
+            known_v = np.concatenate(([carry[1]], known_v))
+        if len(known_t) == 0:
+            return values, np.zeros(len(values), dtype=bool)
+        filled = valid | self.bridged(known_t, timestamps)
+        return np.where(valid, values, np.interp(timestamps, known_t, known_v)), filled
+
+    # Method to clean the new records of an account, given as tuples in COLUMNS order with None for missing values:
+    # ordered, deduplicated, filled and optionally resampled, returned as the sample dictionaries of the scoring
+    def clean(self, account, rows):
+        if not rows:
+            return []
+        try:
+            table = np.array(rows, dtype=np.float64)  # None becomes NaN
+        except (TypeError, ValueError):
+            table = np.array([[to_float(value) for value in row] for row in rows], dtype=np.float64)
+        timestamps = table[:, 0]
+
+        # Keep the records with a timestamp newer than the last one seen, in timestamp order
+        usable = np.isfinite(timestamps) & (timestamps > 0)
+        last_seen = self.last_seen.get(account)
+        if last_seen is not None:
+            usable &= timestamps > last_seen
+        order = np.flatnonzero(usable)
+        order = order[np.argsort(timestamps[order], kind="stable")]
+        timestamps = timestamps[order]
+        # A reading re-sent by the watch has the timestamp of the first one, counted with the ones already seen
+        first = np.concatenate(([True], timestamps[1:] != timestamps[:-1])) if len(timestamps) else np.zeros(0, dtype=bool)
+        metrics.increment("dropped_duplicates", int(len(rows) - np.count_nonzero(first)))
+        order, timestamps = order[first], timestamps[first]
+        table = table[order]
+        if not len(timestamps):
+            return []
+        self.last_seen[account] = float(timestamps[-1])
+
+        columns = {field: table[:, column] for column, field in enumerate(COLUMNS) if column}
+        # The watch reports 0 when it has no heart rate reading
+        columns["heartrateSensor"][columns["heartrateSensor"] <= 0] = math.nan
+
+        # Fill the missing values, the records that cannot be filled are dropped
+        carry = self.carry.setdefault(account, {})
+        missing = ~np.isfinite(table[:, 1:])
+        if missing.any():
+            complete = np.ones(len(timestamps), dtype=bool)
+            for column in np.flatnonzero(missing.any(axis=0)):
+                field = FIELDS[column]
+                columns[field], filled = self.fill(timestamps, columns[field], carry.get(field))
+                complete &= filled
+            metrics.increment("filled_values", int(np.count_nonzero(missing[complete])))
+            metrics.increment("dropped_incomplete", int(np.count_nonzero(~complete)))
+            timestamps = timestamps[complete]
+            columns = {field: values[complete] for field, values in columns.items()}
+            if not len(timestamps):
+                return []
+
+        if self.resample_period:
+            timestamps, columns = self.resample(account, timestamps, columns, carry)
+        if len(timestamps):
+            for field in FIELDS:
+                carry[field] = (float(timestamps[-1]), float(columns[field][-1]))
+
+        return [dict(zip(COLUMNS, row)) for row in zip(timestamps.astype(np.int64).tolist(), *(columns[field].tolist() for field in FIELDS))]
+
+    # Method to resample the cleaned columns to a fixed period, continuing from the previous cycle
+    def resample(self, account, timestamps, columns, carry):
+        period = self.resample_period
+        last_emitted = self.last_emitted.get(account)
+        start = last_emitted + period if last_emitted is not None else math.ceil(timestamps[0] / period) * period
+        grid = np.arange(start, timestamps[-1] + 1, period, dtype=np.float64)
+
+        # The previous cycle's last readings bridge the gap to this cycle
+        known = {field: (timestamps, columns[field]) for field in FIELDS}
+        for field in FIELDS:
+            if field in carry:
+                known[field] = (np.concatenate(([carry[field][0]], timestamps)), np.concatenate(([carry[field][1]], columns[field])))
+
+        # Skip the grid points in a gap longer than max_gap, e.g. while the watch was off
+        grid = grid[self.bridged(known["heartrateSensor"][0], grid)]
+        if len(grid):
+            self.last_emitted[account] = float(grid[-1])
+        return grid, {field: np.interp(grid, *known[field]) for field in FIELDS}
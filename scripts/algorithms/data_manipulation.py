@@ -1,115 +1,158 @@
 # Import necessary modules and classes
-import firebase_admin
-from firebase_admin import db
 from algorithms.keytranslator import KeyTranslator
-# Firebase Admin SDK
-from firebase_admin import credentials, firestore  # Sub-modules for Firebase Admin SDK
 from algorithms.rule_based import RuleBasedAlgorithm  # Custom class for rule-based algorithm
-from algorithms.range_based import BayesianAnalyzer  # Custom class for range-based algorithm
-import time
+from algorithms.range_based import BayesianAnalyzer, DEFAULT_K  # Custom class for range-based algorithm
+from algorithms.storage import FirebaseStorage  # RawData reads and DerivedData writes on Firebase
+from algorithms.cleaning import SampleCleaner  # Ordering, deduplication and filling of the raw samples
+from algorithms.sample_buffer import BASELINE_SIZE  # Size of the baseline window
+from algorithms.state_store import StateStore  # Previous data of the accounts
+from algorithms.metrics import metrics  # Stage timers and counters
+import logging  # Leveled logging
+import time  # Timing of the key translation
+import numpy as np  # Numerical computing library
+
+logger = logging.getLogger(__name__)
+
 # Define DataProcessor class
 class DataProcessor:
     # Constructor
-    def __init__(self, db_firestore):
+    def __init__(self, db_firestore, fetcher=None, k=DEFAULT_K, storage=None, cleaner=None):
         self.db_firestore = db_firestore  # Firestore database reference
+        # Where RawData is read from and DerivedData is written to, Firebase unless a local storage is given
+        self.storage = storage if storage is not None else FirebaseStorage(db_firestore, fetcher)
+        self.fetcher = fetcher if fetcher is not None else storage  # Committed once the cycle is written
         self.rule_based = RuleBasedAlgorithm()  # Rule-based algorithm object
         self.range_based = BayesianAnalyzer()# Range-based algorithm object
+        self.k = k  # Width of the range-based interval, in standard deviations
         self.key_translator=KeyTranslator()
+        self.cleaner = cleaner if cleaner is not None else SampleCleaner()  # Cleans the samples before scoring
 
 
 
 
 
 # Method to retrieve recent raw data from Firestore
-    def get_recent_raw_data(self, identical_data_count, previous_raw_data, MAX_IDENTICAL_DATA_REPETITIONS):
-        recent_raw_data = {}  # Dictionary to store recent raw data for each account
-
-        # Retrieve raw data from Firestore
-        accounts = db.reference("account").get()
-
-        # Check for identical data repetitions
-        if recent_raw_data == previous_raw_data:
-            identical_data_count += 1
-            if identical_data_count >= MAX_IDENTICAL_DATA_REPETITIONS:
-                print("No more new data")
-                # Suspend execution before attempting to fetch new data
-                time.sleep(60)  # Suspend execution for a minute
-                identical_data_count = 0  # Reset repetitions count to zero
-                return self.get_recent_raw_data()  # Recursively call the method to fetch new data
-        else:
-            identical_data_count = 0  # Reset repetitions count to zero
-
-        previous_raw_data = recent_raw_data  # Update previous_raw_data for comparison in the next iteration
-
-        # Translate keys in dictionary using KeyTranslator
-        accounts_ref = self.key_translator.translate_keys_in_dictionary(accounts)
-
-        # Iterate over accounts and their raw data
-        for email, account_data in accounts_ref.items():
-            raw_data_ref = account_data.get("RawData", {})  # If "RawData" doesn't exist, default to an empty dictionary
-
-            recent_raw_data[email] = []  # Initialize list to store raw data for the account
-
-            # Iterate over raw data documents and extract relevant fields
-            for raw_data_id, raw_data_point in raw_data_ref.items():
-                recent_raw_data[email].append({
-                    "heartrateSensor": raw_data_point.get("heartRateSensor", 0),
-                    "skinTemperatureSensor": raw_data_point.get("skinTemperatureSensor", 0),
-                    "edaSensor": raw_data_point.get("edaSensor", 0),
-                    "timestamp": raw_data_point.get("timestamp", 0),
-                    "latitude": raw_data_point.get("latitude", 0),
-                    "longitude": raw_data_point.get("longitude", 0)
-                })
+    def get_recent_raw_data(self):
+        recent_raw_data = dict(self.iter_recent_raw_data())  # Dictionary to store recent raw data for each account
 
-        print(recent_raw_data)
+        metrics.increment("raw_samples", sum(len(samples) for samples in recent_raw_data.values()))
+        if logger.isEnabledFor(logging.DEBUG) and metrics.sample("recent_raw_data"):
+            logger.debug("Recent raw data: %s", recent_raw_data)
         return recent_raw_data  # Returns the recent raw data for all accounts
 
+    # Method to yield the recent raw data of one account at a time, as (email, samples) pairs
+    def iter_recent_raw_data(self):
+        # Retrieve raw data from the storage, only the new records when fetching incrementally or listening
+        with metrics.timer("fetch"):
+            accounts = self.storage.fetch()
+
+        # Iterate over accounts and their raw data, translating the keys one account at a time;
+        # the translation time is summed over the accounts and recorded once as the translate_keys stage
+        translated = self.key_translator.translate_items(accounts)
+        translate_time = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    email, account_data = next(translated)
+                except StopIteration:
+                    break
+                finally:
+                    translate_time += time.perf_counter() - start
+                yield email, self.clean_account(email, account_data)
+        finally:
+            metrics.observe("translate_keys_seconds", translate_time)
+
+    # Method to clean the raw data of one account
+    def clean_account(self, email, account_data):
+        raw_data_ref = account_data.get("RawData", {})  # If "RawData" doesn't exist, default to an empty dictionary
+
+        # Extract the relevant fields of the raw data documents in the cleaner's column order, missing ones as None
+        return self.cleaner.clean(email, [(
+            raw_data_point.get("timestamp"),
+            raw_data_point.get("heartRateSensor"),
+            raw_data_point.get("skinTemperatureSensor"),
+            raw_data_point.get("edaSensor"),
+            raw_data_point.get("latitude"),
+            raw_data_point.get("longitude")
+        ) for raw_data_point in raw_data_ref.values()])
+
     # Method to create derived data from raw data
-    def create_derived_data(self, accounts_dict, predata):
+    def create_derived_data(self, accounts_dict, states):
+        with metrics.timer("create_derived_data"):
+            results = self.score_accounts(accounts_dict, states)
+        metrics.increment("derived_samples", sum(len(entries) for entries in results.values()))
+        return results  # Return derived data for all accounts
+
+    # Method to score the raw data of every account against its previous data,
+    # looked up by email in the StateStore `states`, which creates the state of a new account
+    def score_accounts(self, accounts_dict, states):
+        if not isinstance(states, StateStore):
+            raise TypeError(f"states must be a StateStore, not {type(states).__name__}")
         results = {}  # Dictionary to store derived data for each account
 
-        # Iterate over each account's raw data and previous data
-        for (email1, account_data), (email2, pdata) in zip(accounts_dict.items(), predata.items()):
-            raw_data = account_data["RawData"]  # Get raw data for the account
+        ranges = {}  # Data for the range-based algorithm of each account
+        baselines = {}  # Cached baseline statistics of each account
+        pending = []  # Accounts with a full baseline, scored once every posterior is ready
+
+        # Iterate over each account's raw data and its own previous data
+        for email1, account_data in accounts_dict.items():
+            pdata = states.get(email1)  # Previous data of the account, created for a new account
+            new_data = pdata.new_samples(account_data["RawData"])  # Skip the samples already processed
+            if not new_data:
+                continue  # Nothing new for the account in this cycle
+            pdata.processed(new_data)
 
             # Extend initial data if it's less than 120 samples, otherwise update it
-            if len(pdata["init_data"]) < 120:
-                pdata["init_data"].extend(raw_data)
+            raw_data = new_data
+            if len(pdata.init_data) < BASELINE_SIZE:
+                pdata.init_data.extend(raw_data)
             else:
-                pdata["init_data"] = pdata["init_data"][1:] + raw_data[:1]
+                removed = float(pdata.init_data.column("heartrateSensor")[0])
+                pdata.init_data.append(raw_data[0])  # The ring buffer drops its oldest sample
+                pdata.baseline_stats = self.range_based.slide_baseline(pdata.baseline_stats, pdata.init_data.column("heartrateSensor"), removed)
                 raw_data = raw_data[1:]
-                data_for_range = raw_data + pdata["init_data"]  # Combine current and initial data
-                posterior = self.range_based.calculate_posterior(data_for_range)  # Calculate posterior using range-based algorithm
+                # Combine current and initial data
+                heartrate = np.concatenate(([d["heartrateSensor"] for d in raw_data], pdata.init_data.column("heartrateSensor")))
+                timestamps = np.concatenate(([d["timestamp"] for d in raw_data], pdata.init_data.column("timestamp")))
+                ranges[email1] = (heartrate, timestamps)
+                baselines[email1] = pdata.baseline_stats
+                pending.append((email1, new_data, pdata, raw_data))
+
+        # Calculate posteriors of all accounts in one batched pass of the range-based algorithm
+        posteriors = self.range_based.calculate_posterior_accounts(ranges, self.k, baselines)
 
-                raw_for_score = pdata["next_data"] + account_data["RawData"]  # Combine previous and current raw data
-                stress_scores, final_results = self.rule_based.rule_algorithm_general(raw_for_score)  # Calculate stress scores using rule-based algorithm
+        for email1, new_data, pdata, raw_data in pending:
+            posterior = posteriors[email1]
 
-                # Determine minimum length of posterior and stress_scores lists
-                min_length = min(len(posterior), len(stress_scores), len(raw_data))
-                print("la lunghezza è", min)
+            raw_for_score = pdata.next_data + new_data  # Combine previous and current raw data
+            stress_scores, final_results = self.rule_based.rule_algorithm_general(raw_for_score)  # Calculate stress scores using rule-based algorithm
 
+            # Determine minimum length of posterior and stress_scores lists
+            min_length = min(len(posterior), len(stress_scores), len(raw_data))
 
-                # Combine posterior and stress scores and add them to results
-                for i in range(min_length):
-                    post_data = posterior[i]
-                    stress_data = stress_scores[i]
-                    raw_data_single=raw_data[i]
 
+            # Combine posterior and stress scores and add them to results
+            for i in range(min_length):
+                post_data = posterior[i]
+                stress_data = stress_scores[i]
+                raw_data_single=raw_data[i]
 
 
-                    result = {
-                        "lower_bound": post_data.get("lower_bound", 0.0),
-                        "upper_bound": post_data.get("upper_bound", 0.0),
-                        "stress_score": stress_data.get("stress_score", 0.0) if stress_scores else 0.0,
-                        "timestamp": raw_data_single.get("timestamp", 0.0),
-                        "latitude": post_data.get("latitude", 0.0),
-                        "longitude":  post_data.get("longitude", 0.0)
-                    }
-                    if email1 not in results:
-                        results[email1] = []
-                    results[email1].append(result)
 
-                pdata["next_data"] = final_results  # Update next data for the account
+                result = {
+                    "lower_bound": post_data.get("lower_bound", 0.0),
+                    "upper_bound": post_data.get("upper_bound", 0.0),
+                    "stress_score": stress_data.get("stress_score", 0.0) if stress_scores else 0.0,
+                    "timestamp": raw_data_single.get("timestamp", 0.0),
+                    "latitude": post_data.get("latitude", 0.0),
+                    "longitude":  post_data.get("longitude", 0.0)
+                }
+                if email1 not in results:
+                    results[email1] = []
+                results[email1].append(result)
+
+            pdata.next_data = final_results  # Update next data for the account
 
         return results  # Return derived data for all accounts
 
@@ -134,47 +177,59 @@ class DataProcessor:
                     "long": entry.get("longitude", None),
                     "timestamp": entry.get("timestamp", None)
                 })
-        print(extracted_data)
+        if logger.isEnabledFor(logging.DEBUG) and metrics.sample("extracted_data"):
+            logger.debug("Derived data for the map: %s", extracted_data)
         return extracted_data  # Return extracted data
 
     # Method to add derived data to Firestore
     def add_data_to_firestore(self, data,data_prec):
 
         if not data:  # Check if data is empty
-            print("No data to add to Firestore.")
+            logger.info("No data to add to Firestore.")
+            self.storage.flush()  # Retry the writes a previous cycle could not commit
             return
 
-        #print(dat)
-        len(data)
-        print(data)
-
+        if logger.isEnabledFor(logging.DEBUG) and metrics.sample("derived_data"):
+            logger.debug("Derived data: %s", data)
 
+        self.storage.reset_stats()
         for email, derived_data in data.items():
-            email_doc_ref = self.db_firestore.collection("account").document(email)  # Reference to account document
-            derived_data_collection_ref = email_doc_ref.collection("DerivedData")  # Reference to derived data collection
-
-            # Iterate over derived data entries and add them to Firestore
-            for entry in derived_data:
-                # check if exists timestamp
-                timestamp = entry["timestamp"]
-
-
-
-                lower_bound = entry["lower_bound"]
-                upper_bound = entry["upper_bound"]
-                stress_score = entry["stress_score"]
-                timestamp = entry["timestamp"]
-                lower_bound = entry["lower_bound"]
-                upper_bound = entry["upper_bound"]
-                stress_score = entry["stress_score"]
-
-
-                # Create document reference for each entry and set its data
-                entry_doc_ref = derived_data_collection_ref.document(str(timestamp))
-                entry_doc_ref.set({
-                    "binterval": [lower_bound, upper_bound],
-                     "stress_score": stress_score,
-                    "timestamp": timestamp
-                })
-        print("Sending Data")
-
+            self.storage.write_derived_data(email, derived_data)
+
+        # Commit the remaining entries before the cycle ends
+        with metrics.timer("add_data_to_firestore"):
+            self.storage.flush()
+        logger.info("Sent derived data: %s", self.storage.report())
+
+    # Method to process the new data one account at a time, from the key translation to the batched write,
+    # so only one account's samples and derived data are held in memory besides the fetched snapshot
+    def process_stream(self, state_store, hotspots=None):
+        self.storage.reset_stats()
+        raw_samples = derived_samples = 0
+
+        with metrics.timer("process_stream"):
+            for email, raw_data in self.iter_recent_raw_data():
+                raw_samples += len(raw_data)
+                account = {email: {"RawData": raw_data}}
+
+                # Score the account against its own previous data
+                derived_data = self.score_accounts(account, state_store)
+                state_store.mark_dirty([email])
+                if not derived_data:
+                    continue
+                derived_samples += len(derived_data[email])
+
+                # Count the stressful points in the hotspots and queue the writes
+                if hotspots is not None:
+                    hotspots.aggregate(self.extract_derived_data_for_map(derived_data))
+                self.storage.write_derived_data(email, derived_data[email])
+
+            # Commit the remaining entries and the hotspot counts before the cycle ends
+            self.storage.flush()
+            if hotspots is not None:
+                hotspots.update_hotspots()
+
+        metrics.increment("raw_samples", raw_samples)
+        metrics.increment("derived_samples", derived_samples)
+        logger.info("Sent derived data: %s", self.storage.report())
+        return derived_samples  # Return the number of derived samples written
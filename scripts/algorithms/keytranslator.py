@@ -0,0 +1,44 @@
+# Import necessary libraries
+import re  # Regular expressions
+from functools import lru_cache  # Cache of the translated keys
+
+KEY_CACHE_SIZE = 65536  # Translated keys kept in memory, the same accounts recur every cycle
+
+# The app encodes "@" as "@@" and "." as "@" in the Realtime Database keys.
+# "@@" decodes to "@" unless it ends the key, any other "@x" decodes to ".x".
+ENCODED_PATTERN = re.compile(r"@(?:(@)(?=.)|(.))", re.DOTALL)
+
+# Function to decode an escape sequence of an account key
+def _decode_match(match):
+    return "@" if match.group(1) else "." + match.group(2)
+
+# Function to decode an account key into the email
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def decode_key(key):
+    if "@" not in key:
+        return key
+    return ENCODED_PATTERN.sub(_decode_match, key)
+
+# Function to encode an email into the account key used in the Realtime Database
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def encode_key(email):
+    return email.replace("@", "@@").replace(".", "@")
+
+# Define KeyTranslator class
+class KeyTranslator:
+    # Method to decode an account key into the email
+    def decode_key(self, key):
+        return decode_key(key)
+
+    # Method to encode an email into the account key, to build write paths
+    def encode_key(self, email):
+        return encode_key(email)
+
+    # Method to translate the keys of a dictionary lazily, one (email, value) pair at a time
+    def translate_items(self, dictionary):
+        for key, value in dictionary.items():
+            yield decode_key(key), value
+
+    # Method to translate the keys of a dictionary
+    def translate_keys_in_dictionary(self, dictionary):
+        return dict(self.translate_items(dictionary))
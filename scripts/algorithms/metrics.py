@@ -0,0 +1,158 @@
+# Import necessary libraries
+import bisect  # Histogram bucket lookup
+import json  # JSON export
+import threading  # Lock and HTTP server thread
+import time  # Module for time-related functions
+from contextlib import contextmanager  # Timer context manager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Prometheus endpoint
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 40.0)
+BYTES_SAMPLE_EVERY = 100  # One Firebase payload in this many is serialized to estimate the bytes
+
+# Define Histogram class
+class Histogram:
+    # Constructor with the upper bounds of the buckets
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets  # Upper bounds of the buckets
+        self.counts = [0] * (len(buckets) + 1)  # Observations per bucket, the last one is +Inf
+        self.count = 0  # Number of observations
+        self.sum = 0.0  # Sum of the observations
+        self.last = 0.0  # Last observation
+
+    # Method to add an observation
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.last = value
+
+    # Method to add the observations of another histogram with the same buckets
+    def merge(self, other):
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.last = other.last
+
+# Define Metrics class
+class Metrics:
+    # Constructor with the prefix of the exported metric names
+    def __init__(self, prefix="chillin"):
+        self.prefix = prefix  # Prefix of the metric names
+        self.counters = {}  # Value of each counter
+        self.histograms = {}  # Histogram of each timer
+        self.samples = {}  # Calls of each sampled log
+        self.lock = threading.Lock()  # Metrics are updated from the writer threads too
+
+    # Method to increase a counter
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # Method to add an observation to a histogram
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    # Method to time a block of code, recorded in the "<name>_seconds" histogram
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - start)
+
+    # Method to count a Firebase call and estimate the size of its payloads. Serializing every payload
+    # would cost as much as the call, so one in BYTES_SAMPLE_EVERY is measured and counted that many times;
+    # the first call, e.g. the listener's snapshot of the whole node, is never the measured one
+    def firebase_call(self, operation, payload=None):
+        name = f"firebase_{operation}_calls"
+        with self.lock:
+            calls = self.counters.get(name, 0)
+            self.counters[name] = calls + 1
+        if payload is not None and calls % BYTES_SAMPLE_EVERY == BYTES_SAMPLE_EVERY - 1:
+            self.increment(f"firebase_{operation}_bytes_estimated", BYTES_SAMPLE_EVERY * len(json.dumps(payload, default=str)))
+
+    # Method to take the metrics recorded so far and reset them, so a worker process can ship them
+    def drain(self):
+        with self.lock:
+            drained = {"counters": self.counters, "histograms": self.histograms}
+            self.counters = {}
+            self.histograms = {}
+        return drained
+
+    # Method to add the metrics drained from a worker process
+    def merge(self, drained):
+        with self.lock:
+            for name, value in drained["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, other in drained["histograms"].items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram(other.buckets)
+                histogram.merge(other)
+
+    # Method to decide whether a sampled log line is emitted, once every `every` calls
+    def sample(self, name, every=100):
+        with self.lock:
+            calls = self.samples.get(name, 0)
+            self.samples[name] = calls + 1
+        return calls % every == 0
+
+    # Method to export the metrics in the Prometheus text format
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+                lines.append(f"{self.prefix}_{name}_total {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.sum}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # Method to export the metrics as a single JSON line
+    def to_json(self):
+        with self.lock:
+            return json.dumps({
+                "time": time.time(),
+                "counters": dict(self.counters),
+                "timers": {
+                    name: {"count": histogram.count, "sum": round(histogram.sum, 6), "last": round(histogram.last, 6)}
+                    for name, histogram in self.histograms.items()
+                }
+            })
+
+    # Method to serve the Prometheus text on http://<host>:<port>/metrics from a daemon thread
+    def start_http_server(self, port, host=""):
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are not worth a log line
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+# Metrics shared by the whole process
+metrics = Metrics()
@@ -1,52 +1,255 @@
 # Import necessary libraries
+import json  # Calibrated k file
+import os  # File system functions
 import numpy as np  # Numerical computing library
 from scipy.stats import invgamma  # Inverse gamma distribution from scipy.stats
 
+DEFAULT_K = 0.1  # Width of the interval in standard deviations, when no calibrated k is available
+K_GRID = np.linspace(0.01, 0.9, 9)  # k values tried by the calibration
+BASELINE_REFRESH = 1000  # Slides after which cached baseline sums are recomputed, bounding the rounding drift
+
+# Function to read the k chosen by the calibration, the default when it was not run
+def load_k(path, default=DEFAULT_K):
+    if path is None or not os.path.exists(path):
+        return default
+    with open(path) as k_file:
+        return float(json.load(k_file)["k"])
+
+# Define BaselineStats class
+class BaselineStats:
+    __slots__ = ("count", "total", "total_sq", "slides")
+
+    # Constructor with the samples of the baseline window
+    def __init__(self, values=()):
+        values = np.asarray(values, dtype=float)
+        self.count = len(values)  # Number of samples in the window
+        self.total = float(values.sum())  # Sum of the samples
+        self.total_sq = float(np.dot(values, values))  # Sum of the squared samples
+        self.slides = 0  # Slides since the sums were computed from the samples
+
+    # Method to slide the window by one sample
+    def slide(self, added, removed):
+        self.total += added - removed
+        self.total_sq += added * added - removed * removed
+        self.slides += 1
+
+    # Method to get the mean of the window
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    # Method to get the variance of the window
+    def variance(self):
+        return max(self.total_sq / self.count - self.mean() ** 2, 0.0) if self.count else 0.0
+
+# Define PosteriorStream class
+class PosteriorStream:
+    # Constructor with the training window of a single account
+    def __init__(self, y_train, alpha_prior=0.01, beta_prior=0.01, random_state=None):
+        self.n_train = len(y_train)  # Number of training samples
+        self.alpha_prior = alpha_prior  # Alpha prior parameter
+        self.beta_prior = beta_prior    # Beta prior parameter
+        self.random_state = random_state  # Random generator, None uses the global numpy one
+
+        # Running statistics of every sample seen so far (Welford)
+        self.count = 0    # Number of samples
+        self.mean = 0.0   # Running mean
+        self.m2 = 0.0     # Running sum of squared deviations from the mean
+        for y in y_train:
+            self.push(y)
+
+        # Initialize initial values for mean and variance
+        self.mu_i = self.mean  # Initial mean
+        self.sigma2_i = self.m2 / self.count if self.count else 0.0  # Initial variance
+
+    # Method to add a sample to the running statistics
+    def push(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    # Method to compute the sum of squared deviations of the seen samples from mu
+    def squared_deviation(self, mu):
+        return self.m2 + self.count * (self.mean - mu) ** 2
+
+    # Method to run one Gibbs step for a new sample, in constant time
+    def update(self, value, timestamp, k=0.1):
+        rng = self.random_state if self.random_state is not None else np.random
+        # Update mean using normal distribution
+        self.mu_i = rng.normal(loc=self.mean, scale=np.sqrt(self.sigma2_i/self.n_train))
+        # Update variance using inverse gamma distribution
+        self.sigma2_i = invgamma.rvs(a=(self.n_train+self.alpha_prior)/2, scale=(self.squared_deviation(self.mu_i)+self.beta_prior)/2, random_state=self.random_state)
+
+        # The new sample is part of the prefix for the next step
+        self.push(value)
+
+        return {
+            'lower_bound': self.mu_i - k * np.sqrt(self.sigma2_i),
+            'upper_bound': self.mu_i + k * np.sqrt(self.sigma2_i),
+            'timestamp': timestamp
+        }
+
 # Define BayesianAnalyzer class
 class BayesianAnalyzer:
-    # Constructor with optional alpha and beta prior parameters
-    def __init__(self, alpha_prior=0.01, beta_prior=0.01):
+    # Constructor with optional alpha and beta prior parameters and an optional seed
+    def __init__(self, alpha_prior=0.01, beta_prior=0.01, seed=None):
         self.alpha_prior = alpha_prior  # Alpha prior parameter
         self.beta_prior = beta_prior    # Beta prior parameter
+        # Seeded generator for reproducible draws, None keeps the global numpy one
+        self.random_state = np.random.RandomState(seed) if seed is not None else None
+        self.streams = {}  # Posterior streams of each account
+
+    # Method to create a posterior stream from a training window
+    def create_stream(self, y_train):
+        return PosteriorStream(y_train, self.alpha_prior, self.beta_prior, self.random_state)
 
     # Method to calculate posterior distribution
     def calculate_posterior(self, data, k=0.1, mu_prior=0, tau2_prior=1, nu_prior=100):
-        # Initialize lists to store posterior results
-        mu_posterior = []   # Posterior mean
-        sigma2_posterior = []  # Posterior variance
-        lower_bound = []    # Lower bound of confidence interval
-        upper_bound = []    # Upper bound of confidence interval
         posterior_results = []  # List to store posterior results
 
         # Check if data length is sufficient for training
         if len(data) >= 120:
             n_train = 120  # Number of training samples
             y_train = [d['heartrateSensor'] for d in data[:n_train]]  # Extract heart rate data for training
+            stream = self.create_stream(y_train)
 
-            # Initialize initial values for mean and variance
-            mu_i = np.mean(y_train)  # Initial mean
-            sigma2_i = np.var(y_train)  # Initial variance
-
-            # Iterate over remaining data points
+            # Iterate over remaining data points, each one updates the running sums
             for j in range(n_train, len(data)):
-                # Update mean using normal distribution
-                mu_i = np.random.normal(loc=np.mean([d['heartrateSensor'] for d in data[:j]]), scale=np.sqrt(sigma2_i/n_train))
-                # Update variance using inverse gamma distribution
-                sigma2_i = invgamma.rvs(a=(n_train+self.alpha_prior)/2, scale=(np.sum([(d['heartrateSensor']-mu_i)**2 for d in data[:j]])+self.beta_prior)/2)
+                posterior_results.append(stream.update(data[j]['heartrateSensor'], data[j]['timestamp'], k))
+
+        return posterior_results  # Return posterior results
+
+    # Method to slide the cached statistics of a baseline window by one sample,
+    # rebuilding them from the window when missing or due for a refresh
+    def slide_baseline(self, stats, window, removed):
+        if stats is None or stats.count != len(window) or stats.slides >= BASELINE_REFRESH:
+            return BaselineStats(window)
+        stats.slide(float(window[-1]), removed)
+        return stats
+
+    # Method to calculate the posterior of many accounts at once, train_stats optionally
+    # holds the (sum, sum of squares) of every training window so they are not rescanned
+    def calculate_posterior_batch(self, windows, k=0.1, n_train=120, train_stats=None):
+        windows = np.asarray(windows, dtype=float)  # Heart rate windows, one row per account
+        n_accounts, n_samples = windows.shape
+        if n_samples <= n_train:
+            empty = np.empty((n_accounts, 0))
+            return empty, empty
+
+        if train_stats is None:
+            # Center each row on its training mean to keep the prefix sums well conditioned
+            shift = windows[:, :n_train].mean(axis=1)
+            centered = windows - shift[:, None]
+            prefix_sum = np.cumsum(centered, axis=1)[:, n_train - 1:-1]         # Prefix sums
+            prefix_sq = np.cumsum(centered ** 2, axis=1)[:, n_train - 1:-1]     # Prefix sums of squares
+
+            # Initialize initial values for variance
+            sigma2_i = windows[:, :n_train].var(axis=1)
+        else:
+            # Start from the training sums, only the samples after the training window are scanned
+            train_sum, train_sq = train_stats
+            shift = train_sum / n_train
+            sigma2_i = np.maximum(train_sq / n_train - shift ** 2, 0.0)
+            centered = windows[:, n_train:-1] - shift[:, None]
+            start = np.zeros((n_accounts, 1))
+            prefix_sum = np.hstack((start, np.cumsum(centered, axis=1)))
+            prefix_sq = n_train * sigma2_i[:, None] + np.hstack((start, np.cumsum(centered ** 2, axis=1)))
+        rng = self.random_state if self.random_state is not None else np.random
+
+        n_steps = n_samples - n_train
+        lower_bound = np.empty((n_accounts, n_steps))
+        upper_bound = np.empty((n_accounts, n_steps))
+        for step, j in enumerate(range(n_train, n_samples)):
+            s1 = prefix_sum[:, step]
+            s2 = prefix_sq[:, step]
+            # Update means of every account using one normal draw
+            mu_i = rng.normal(loc=s1 / j, scale=np.sqrt(sigma2_i / n_train))
+            # Sum of squared deviations of the prefix from mu, from the prefix sums
+            squared_deviation = s2 - 2 * mu_i * s1 + j * mu_i ** 2
+            # Update variances of every account using one inverse gamma draw
+            sigma2_i = invgamma.rvs(a=(n_train+self.alpha_prior)/2, scale=(squared_deviation+self.beta_prior)/2, size=n_accounts, random_state=self.random_state)
+
+            mu_i = mu_i + shift
+            lower_bound[:, step] = mu_i - k * np.sqrt(sigma2_i)
+            upper_bound[:, step] = mu_i + k * np.sqrt(sigma2_i)
 
-                # Calculate lower and upper bounds of confidence interval
-                lower_bound.append(mu_i - k * np.sqrt(sigma2_i))
-                upper_bound.append(mu_i + k * np.sqrt(sigma2_i))
+        return lower_bound, upper_bound  # Return bounds, one row per account
 
-                # Append posterior results
-                posterior_results.append({
-                    'lower_bound': mu_i - k * np.sqrt(sigma2_i),
-                    'upper_bound': mu_i + k * np.sqrt(sigma2_i),
-                    'timestamp': data[j]['timestamp']
-                })
+    # Method to calculate the posterior of every account, batching windows of equal length.
+    # baselines optionally maps accounts to the BaselineStats of the last 120 samples of their window.
+    def calculate_posterior_accounts(self, windows_by_account, k=0.1, baselines=None):
+        baselines = baselines or {}
+        results = {account: [] for account in windows_by_account}  # Posterior results of each account
+
+        # Group accounts by window length so each group is a rectangular array
+        groups = {}
+        for account, (heartrate, timestamps) in windows_by_account.items():
+            if len(heartrate) > 120:
+                groups.setdefault(len(heartrate), []).append(account)
+
+        for accounts in groups.values():
+            windows = np.stack([windows_by_account[account][0] for account in accounts])
+            lower_bound, upper_bound = self.calculate_posterior_batch(windows, k, 120, self.training_stats(windows, accounts, baselines))
+            for row, account in enumerate(accounts):
+                timestamps = windows_by_account[account][1][120:]
+                results[account] = [{
+                    'lower_bound': float(lower),
+                    'upper_bound': float(upper),
+                    'timestamp': int(timestamp)
+                } for lower, upper, timestamp in zip(lower_bound[row], upper_bound[row], timestamps)]
+
+        return results  # Return posterior results of each account
+
+    # Method to get the training sums of a group of windows from the cached baselines, None when one is missing.
+    # The first 120 samples of a window are its new samples followed by the baseline without its last samples.
+    def training_stats(self, windows, accounts, baselines, n_train=120):
+        head = windows.shape[1] - n_train  # New samples in front of the baseline
+        stats = [baselines.get(account) for account in accounts]
+        if head > n_train or any(s is None or s.count != n_train for s in stats):
+            return None
+        new, dropped = windows[:, :head], windows[:, n_train:]
+        train_sum = np.array([s.total for s in stats]) + new.sum(axis=1) - dropped.sum(axis=1)
+        train_sq = np.array([s.total_sq for s in stats]) + (new ** 2).sum(axis=1) - (dropped ** 2).sum(axis=1)
+        return train_sum, train_sq
+
+    # Method to update the posterior of an account with its new samples
+    def update_account_posterior(self, account, data, k=0.1):
+        posterior_results = []  # List to store posterior results
+        stream = self.streams.get(account)
+        if stream is None:
+            # Wait until the account has a full training window
+            if len(data) < 120:
+                return posterior_results
+            stream = self.create_stream([d['heartrateSensor'] for d in data[:120]])
+            self.streams[account] = stream
+            data = data[120:]
+
+        for d in data:
+            posterior_results.append(stream.update(d['heartrateSensor'], d['timestamp'], k))
 
         return posterior_results  # Return posterior results
 
+    # Method to score every k of a grid on the labelled heart rate of one participant.
+    # The posterior trace is drawn once and the intervals of all k are compared with the samples at once.
+    def evaluate_k_grid(self, y, labels, k_grid=K_GRID, n_train=120):
+        y = np.asarray(y, dtype=float)
+        labels = np.asarray(labels)[n_train:]
+        k_grid = np.asarray(k_grid, dtype=float)
+        if len(y) <= n_train:
+            return np.full(len(k_grid), np.nan)
+
+        # With k = 1 the bounds are the posterior mean plus and minus one standard deviation
+        lower, upper = self.calculate_posterior_batch(y[None, :], 1.0, n_train)
+        mu = (lower[0] + upper[0]) / 2
+        sigma = (upper[0] - lower[0]) / 2
+
+        # A sample outside its interval is predicted as stressed, one row per k
+        lower_bound = mu[None, :] - k_grid[:, None] * sigma[None, :]
+        upper_bound = mu[None, :] + k_grid[:, None] * sigma[None, :]
+        samples = y[None, n_train:]
+        predicted = (samples < lower_bound) | (samples > upper_bound)
+        return (predicted == (labels[None, :] == 1)).mean(axis=1)  # Return the accuracy of each k
+
     # Method to find the best k parameter
     def find_best_k(self, df, n_train):
         # Initialize list to store overall accuracies
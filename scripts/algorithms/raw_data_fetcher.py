@@ -0,0 +1,92 @@
+# Import necessary libraries
+import json  # Checkpoint serialization
+import os  # File system functions
+from algorithms.metrics import metrics  # Firebase call counters
+
+# Define CheckpointStore class
+class CheckpointStore:
+    # Constructor with the path of the checkpoint file, None keeps it in memory only
+    def __init__(self, path=None):
+        self.path = path  # Path of the checkpoint file
+        self.positions = {}  # Last processed RawData key of each account
+        if path is not None and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self.positions = json.load(checkpoint_file)
+
+    # Method to get the last processed key of an account
+    def get(self, account):
+        return self.positions.get(account)
+
+    # Method to update the last processed keys of several accounts
+    def update(self, positions):
+        self.positions.update(positions)
+
+    # Method to persist the checkpoint, replacing the file atomically
+    def save(self):
+        if self.path is None:
+            return
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(self.positions, checkpoint_file)
+        os.replace(temporary_path, self.path)
+
+# Define RawDataFetcher class
+class RawDataFetcher:
+    # Constructor with the "account" reference of the Realtime Database
+    def __init__(self, accounts_ref, checkpoint=None, page_size=500):
+        self.accounts_ref = accounts_ref  # Reference to the "account" node
+        self.checkpoint = checkpoint if checkpoint is not None else CheckpointStore()  # Committed positions
+        self.page_size = page_size  # Maximum number of records per query
+        self.pending = {}  # Positions fetched but not committed yet
+
+    # Method to get the last fetched key of an account
+    def position(self, account):
+        if account in self.pending:
+            return self.pending[account]
+        return self.checkpoint.get(account)
+
+    # Method to fetch the RawData records newer than the last fetched key of an account
+    def fetch_account(self, account):
+        raw_data_ref = self.accounts_ref.child(account).child("RawData")
+        last_key = self.position(account)
+        records = {}
+
+        while True:
+            # RawData keys are timestamps, so key order is chronological
+            query = raw_data_ref.order_by_key()
+            limit = self.page_size
+            if last_key is not None:
+                # start_at is inclusive, ask for one more record and drop the already seen one
+                query = query.start_at(last_key)
+                limit += 1
+            page = query.limit_to_first(limit).get() or {}
+            metrics.firebase_call("rtdb_read", page)
+            page_records = {key: value for key, value in page.items() if key != last_key}
+            records.update(page_records)
+
+            if not page_records:
+                break
+            last_key = list(page_records)[-1]
+            if len(page) < limit:
+                break
+
+        if last_key is not None:
+            self.pending[account] = last_key
+        return records
+
+    # Method to fetch new records of every account, shaped like the "account" node, only the accounts that have some
+    def fetch(self):
+        accounts = self.accounts_ref.get(shallow=True) or {}  # Only the account keys
+        metrics.firebase_call("rtdb_read", accounts)
+        new_data = {}
+        for account in accounts:
+            records = self.fetch_account(account)
+            if records:
+                new_data[account] = {"RawData": records}
+        return new_data
+
+    # Method to persist the positions of the records processed so far
+    def commit(self):
+        self.checkpoint.update(self.pending)
+        self.pending = {}
+        self.checkpoint.save()
@@ -0,0 +1,92 @@
+# Import necessary libraries
+import queue  # Bounded queue between the listener and the scoring stage
+import time  # Module for time-related functions
+from algorithms.metrics import metrics  # Firebase event counters
+from algorithms.raw_data_fetcher import CheckpointStore  # Positions of the processed records
+
+# Define RawDataListener class
+class RawDataListener:
+    # Constructor with the "account" reference of the Realtime Database
+    def __init__(self, accounts_ref, checkpoint=None, max_queue=10000, min_batch=30, max_batch=5000, max_wait=5.0):
+        self.accounts_ref = accounts_ref  # Reference to the "account" node
+        self.checkpoint = checkpoint if checkpoint is not None else CheckpointStore()  # Committed positions
+        self.queue = queue.Queue(maxsize=max_queue)  # New records waiting to be scored
+        self.min_batch = min_batch  # Smallest micro-batch
+        self.max_batch = max_batch  # Largest micro-batch
+        self.max_wait = max_wait  # Seconds a micro-batch waits to fill up
+        self.positions = {}  # Last queued key of each account
+        self.pending = {}  # Positions drained but not committed yet
+        self.registration = None  # Listener registration
+
+    # Method to start listening to the child events of the "account" node
+    def start(self):
+        self.registration = self.accounts_ref.listen(self.on_event)
+
+    # Method to stop listening
+    def stop(self):
+        if self.registration is not None:
+            self.registration.close()
+            self.registration = None
+
+    # Method to handle an event, the first one holds the whole node
+    def on_event(self, event):
+        metrics.firebase_call("rtdb_event", event.data)
+        if event.data is None:
+            return  # Deletions carry no records
+        segments = [segment for segment in event.path.split("/") if segment]
+        if event.event_type == "patch":
+            # A patch holds several children of the event path
+            for key, value in event.data.items():
+                self.enqueue(segments + [segment for segment in key.split("/") if segment], value)
+        else:
+            self.enqueue(segments, event.data)
+
+    # Method to queue the records below a path of the "account" node
+    def enqueue(self, segments, data):
+        if not segments:
+            for account, account_data in data.items():
+                self.enqueue([account], account_data)
+        elif len(segments) == 1:
+            if isinstance(data, dict):
+                self.enqueue(segments + ["RawData"], data.get("RawData") or {})
+        elif segments[1] != "RawData":
+            return
+        elif len(segments) == 2:
+            for key in sorted(data):
+                self.put(segments[0], key, data[key])
+        elif len(segments) == 3:
+            self.put(segments[0], segments[2], data)
+
+    # Method to queue a record, blocking the listener while the queue is full
+    def put(self, account, key, record):
+        last_key = self.positions.get(account, self.checkpoint.get(account))
+        if last_key is not None and key <= last_key:
+            return  # Already processed, the first event repeats the whole node
+        self.queue.put((account, key, record))  # Blocks the event stream until the scoring stage catches up
+        self.positions[account] = key
+
+    # Method to get a micro-batch, shaped like the "account" node
+    def fetch(self):
+        # The batch grows with the backlog, so a busy queue is drained in fewer cycles
+        batch_size = min(self.max_batch, max(self.min_batch, self.queue.qsize()))
+        deadline = time.monotonic() + self.max_wait
+        new_data = {}
+        count = 0
+        while count < batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                account, key, record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            new_data.setdefault(account, {"RawData": {}})["RawData"][key] = record
+            self.pending[account] = key
+            count += 1
+        return new_data
+
+    # Method to persist the positions of the records processed so far
+    def commit(self):
+        self.checkpoint.update(self.pending)
+        self.pending = {}
+        self.checkpoint.save()
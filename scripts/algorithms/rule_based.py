@@ -59,4 +59,51 @@ class RuleBasedAlgorithm:
             score = 0
         return score  # Return score
 
-    # Method implementing ru
+    # Method counting, for every position at once, the samples that do not exceed it,
+    # looking from `offset` samples after it up to the end of its window
+    def run_lengths(self, samplings, offset=1, window=WINDOW_SIZE):
+        values = np.asarray(samplings, dtype=float)
+        size = len(values)
+        if size == 0:
+            return np.zeros(0, dtype=int)
+        # Padding never exceeds a sample, the windows past the end are clipped below
+        padded = np.concatenate((values, np.full(window - 1, -np.inf)))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window)[:, offset:]
+        exceeds = windows > values[:, None]
+        first = np.where(exceeds.any(axis=1), exceeds.argmax(axis=1), window - offset)
+        positions = np.arange(size)
+        available = np.clip(np.minimum(positions + window, size) - (positions + offset), 0, None)
+        return np.minimum(first, available)
+
+    # Method implementing rule 1 on the window starting at every position
+    def rule1_batch(self, samplings, window=WINDOW_SIZE):
+        n = self.run_lengths(samplings, 1, window)
+        # Same thresholds as rule1
+        score = np.where((RULE1_THRESHOLD_LOW < n) & (n < RULE1_THRESHOLD_HIGH), 1.0,
+                np.where((RULE1_THRESHOLD_HIGH < n) & (n < RULE2_THRESHOLD_LOW), 0.5, 0.0))
+        return score, n  # Return scores and run lengths
+
+    # Method implementing rule 2 on the window starting at every position
+    def rule2_batch(self, samplings_temperature, window=WINDOW_SIZE):
+        n = self.run_lengths(samplings_temperature, 3, window)
+        # Same thresholds as rule2
+        score = np.where((RULE2_THRESHOLD_LOW < n) & (n < RULE2_THRESHOLD_HIGH), 1.0,
+                np.where((RULE2_THRESHOLD_HIGH <= n) & (n <= RULE3_THRESHOLD_LOW), 0.5, 0.0))
+        return score  # Return scores
+
+    # Method implementing the general rule-based algorithm on a sequence of samples.
+    # Stand-in built from rule 1 and rule 2, rule 3 and rule 4 are missing from this tree:
+    # rule 1 runs on the EDA, rule 2 on the skin temperature, and the stress score of a
+    # sample is the mean of the two. Only the samples with a complete window are scored,
+    # the others are returned to be carried over and scored with the next samples
+    def rule_algorithm_general(self, samplings, window=WINDOW_SIZE):
+        complete = max(len(samplings) - window + 1, 0)  # Samples with a complete window
+        if complete == 0:
+            return [], list(samplings)
+        eda = [sample["edaSensor"] for sample in samplings]
+        temperature = [sample["skinTemperatureSensor"] for sample in samplings]
+        rule1_scores, _ = self.rule1_batch(eda, window)
+        rule2_scores = self.rule2_batch(temperature, window)
+        scores = (rule1_scores[:complete] + rule2_scores[:complete]) / 2
+        stress_scores = [{"stress_score": score} for score in scores.tolist()]
+        return stress_scores, list(samplings[complete:])  # Return scores and carried over samples
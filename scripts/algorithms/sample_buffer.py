@@ -0,0 +1,82 @@
+# Import necessary libraries
+import struct  # Binary header of the serialized buffer
+import numpy as np  # Numerical computing library
+
+# Columns of a raw data sample with their types (sensors are sent as floats, GPS as doubles)
+COLUMNS = (
+    ("heartrateSensor", np.float32),
+    ("skinTemperatureSensor", np.float32),
+    ("edaSensor", np.float32),
+    ("timestamp", np.int64),
+    ("latitude", np.float64),
+    ("longitude", np.float64),
+)
+BASELINE_SIZE = 120  # Number of samples of the baseline window
+HEADER = struct.Struct("<II")  # Capacity and size of a serialized buffer
+
+# Define SampleBuffer class
+class SampleBuffer:
+    # Constructor with the maximum number of samples kept
+    def __init__(self, capacity=BASELINE_SIZE):
+        self.capacity = capacity  # Maximum number of samples
+        # Each column holds two copies of the ring, so the window is always a contiguous slice
+        self.columns = {name: np.zeros(2 * capacity, dtype=dtype) for name, dtype in COLUMNS}
+        self.start = 0  # Position of the oldest sample
+        self.size = 0   # Number of samples stored
+
+    def __len__(self):
+        return self.size
+
+    # Method to append a sample, dropping the oldest one when the buffer is full
+    def append(self, sample):
+        if self.size < self.capacity:
+            position = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            position = self.start
+            self.start = (self.start + 1) % self.capacity
+
+        for name, column in self.columns.items():
+            value = sample.get(name, 0)
+            column[position] = value
+            column[position + self.capacity] = value
+
+    # Method to append a list of samples
+    def extend(self, samples):
+        for sample in samples:
+            self.append(sample)
+
+    # Method to get a column of the window, oldest sample first, without copying
+    def column(self, name):
+        return self.columns[name][self.start:self.start + self.size]
+
+    # Method to get every column of the window, without copying
+    def window(self):
+        return {name: self.column(name) for name in self.columns}
+
+    # Method to convert the window back to a list of samples
+    def to_records(self):
+        columns = [(name, self.column(name).tolist()) for name in self.columns]
+        return [{name: values[i] for name, values in columns} for i in range(self.size)]
+
+    # Method to get the memory used by the buffer, in bytes
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    # Method to serialize the window, column by column
+    def to_bytes(self):
+        return HEADER.pack(self.capacity, self.size) + b"".join(self.column(name).tobytes() for name in self.columns)
+
+    # Method to rebuild a buffer from its serialized window
+    @classmethod
+    def from_bytes(cls, data):
+        capacity, size = HEADER.unpack_from(data)
+        buffer = cls(capacity)
+        offset = HEADER.size
+        for name, dtype in COLUMNS:
+            values = np.frombuffer(data, dtype=dtype, count=size, offset=offset)
+            buffer.columns[name][:size] = values
+            buffer.columns[name][capacity:capacity + size] = values
+            offset += values.nbytes
+        buffer.size = size
+        return buffer
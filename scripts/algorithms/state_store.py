@@ -0,0 +1,261 @@
+# Import necessary libraries
+import json  # Serialization of the rule-based carry-over
+import os  # File system functions
+import sqlite3  # Local SQLite backend
+import struct  # Binary layout of the snapshots
+import time  # Module for time-related functions
+from algorithms.sample_buffer import SampleBuffer  # Ring buffer for the baseline window
+
+FORMAT_VERSION = 2  # Version of the serialized account state
+STATE_HEADER = struct.Struct("<BII")  # Version, baseline size in bytes, carry-over size in bytes
+LAST_TIMESTAMP = struct.Struct("<q")  # Last processed timestamp, from version 2
+NO_TIMESTAMP = -1  # Serialized last timestamp of an account with nothing processed yet
+SNAPSHOT_MAGIC = b"CHST"  # First bytes of a snapshot file
+ENTRY_HEADER = struct.Struct("<HI")  # Account key size and state size of a snapshot entry
+
+# Define AccountState class
+class AccountState:
+    __slots__ = ("init_data", "next_data", "last_timestamp", "last_seen", "baseline_stats")
+
+    # Constructor with the baseline window, the rule-based carry-over and the last processed timestamp
+    def __init__(self, init_data=None, next_data=None, last_timestamp=None):
+        self.init_data = init_data if init_data is not None else SampleBuffer()  # Baseline window
+        self.next_data = next_data if next_data is not None else []  # Samples carried over to the next cycle
+        self.last_timestamp = last_timestamp  # Timestamp of the last processed sample
+        self.last_seen = time.monotonic()  # Time of the last access, used to evict idle accounts
+        self.baseline_stats = None  # Cached sums of the baseline heart rate, rebuilt after a restart
+
+    # Method to record an access to the state
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    # Method to drop the samples that were already processed
+    def new_samples(self, raw_data):
+        if self.last_timestamp is None:
+            return raw_data
+        return [sample for sample in raw_data if sample["timestamp"] > self.last_timestamp]
+
+    # Method to remember the last processed sample
+    def processed(self, raw_data):
+        if raw_data:
+            self.last_timestamp = max(int(sample["timestamp"]) for sample in raw_data)
+
+# Function to create the state of a new account
+def new_account_state():
+    return AccountState()
+
+# Function to serialize the state of an account
+def encode_state(state):
+    baseline = state.init_data.to_bytes()
+    carry_over = json.dumps(state.next_data, default=float).encode()
+    last_timestamp = state.last_timestamp if state.last_timestamp is not None else NO_TIMESTAMP
+    return (STATE_HEADER.pack(FORMAT_VERSION, len(baseline), len(carry_over)) + baseline + carry_over
+            + LAST_TIMESTAMP.pack(last_timestamp))
+
+# Function to rebuild the state of an account, version 1 states have no last timestamp
+def decode_state(data):
+    version, baseline_size, carry_over_size = STATE_HEADER.unpack_from(data)
+    if version not in (1, FORMAT_VERSION):
+        raise ValueError(f"Unsupported state version {version}")
+    start = STATE_HEADER.size
+    end = start + baseline_size + carry_over_size
+    last_timestamp = None
+    if version >= 2:
+        last_timestamp = LAST_TIMESTAMP.unpack_from(data, end)[0]
+        if last_timestamp == NO_TIMESTAMP:
+            last_timestamp = None
+    return AccountState(
+        SampleBuffer.from_bytes(bytes(data[start:start + baseline_size])),
+        json.loads(bytes(data[start + baseline_size:end])),
+        last_timestamp
+    )
+
+# Define MemoryBackend class
+class MemoryBackend:
+    persistent = False  # Nothing outlives the process, so an evicted state is dropped rather than saved
+
+    # Constructor, states only live as long as the process
+    def __init__(self):
+        self.states = {}  # Serialized state of each account
+
+    # Method to load the serialized state of an account
+    def load(self, account):
+        return self.states.get(account)
+
+    # Method to save the serialized states of several accounts
+    def save(self, states):
+        self.states.update(states)
+
+    # Method to delete the states of several accounts
+    def delete(self, accounts):
+        for account in accounts:
+            self.states.pop(account, None)
+
+# Define SQLiteBackend class
+class SQLiteBackend:
+    persistent = True  # States survive a restart and an eviction
+    # Constructor with the path of the database file, shared by the worker processes:
+    # WAL lets them read while one writes, and a writer waits up to `timeout` seconds for the lock
+    def __init__(self, path, timeout=30.0):
+        self.connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS account_state (account TEXT PRIMARY KEY, state BLOB NOT NULL)")
+        self.connection.commit()
+
+    # Method to load the serialized state of an account
+    def load(self, account):
+        row = self.connection.execute("SELECT state FROM account_state WHERE account = ?", (account,)).fetchone()
+        return row[0] if row is not None else None
+
+    # Method to save the serialized states of several accounts in one transaction
+    def save(self, states):
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO account_state (account, state) VALUES (?, ?)", states.items())
+
+    # Method to delete the states of several accounts
+    def delete(self, accounts):
+        with self.connection:
+            self.connection.executemany("DELETE FROM account_state WHERE account = ?", [(account,) for account in accounts])
+
+# Define SnapshotBackend class
+class SnapshotBackend:
+    persistent = True  # States survive a restart and an eviction
+    # Constructor with the path of the snapshot file, read on first access
+    def __init__(self, path):
+        self.path = path  # Path of the snapshot file
+        self.states = None  # Serialized state of each account, None until the file is read
+
+    # Method to read the snapshot file
+    def read(self):
+        self.states = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as snapshot_file:
+            data = snapshot_file.read()
+        if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.path} is not a state snapshot")
+        view = memoryview(data)
+        offset = len(SNAPSHOT_MAGIC)
+        while offset < len(data):
+            key_size, state_size = ENTRY_HEADER.unpack_from(data, offset)
+            offset += ENTRY_HEADER.size
+            account = bytes(view[offset:offset + key_size]).decode()
+            offset += key_size
+            self.states[account] = bytes(view[offset:offset + state_size])
+            offset += state_size
+
+    # Method to write the snapshot file, replacing it atomically
+    def write(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as snapshot_file:
+            snapshot_file.write(SNAPSHOT_MAGIC)
+            for account, state in self.states.items():
+                key = account.encode()
+                snapshot_file.write(ENTRY_HEADER.pack(len(key), len(state)))
+                snapshot_file.write(key)
+                snapshot_file.write(state)
+        os.replace(temporary_path, self.path)
+
+    # Method to load the serialized state of an account
+    def load(self, account):
+        if self.states is None:
+            self.read()
+        return self.states.get(account)
+
+    # Method to save the serialized states of several accounts
+    def save(self, states):
+        if self.states is None:
+            self.read()
+        self.states.update(states)
+        self.write()
+
+    # Method to delete the states of several accounts
+    def delete(self, accounts):
+        if self.states is None:
+            self.read()
+        for account in accounts:
+            self.states.pop(account, None)
+        self.write()
+
+# Define StateStore class
+class StateStore:
+    # Constructor with the backend, the seconds between two flushes and the seconds after which an idle account leaves memory
+    def __init__(self, backend=None, flush_interval=60.0, idle_ttl=3600.0):
+        self.backend = backend if backend is not None else MemoryBackend()  # Where the states are persisted
+        self.flush_interval = flush_interval  # Seconds between two flushes
+        self.idle_ttl = idle_ttl  # Seconds without data before a state is dropped from memory, None keeps every state
+        self.states = {}  # States loaded so far, keyed by email
+        self.dirty = set()  # Accounts changed since the last flush
+        self.last_flush = time.monotonic()  # Time of the last flush
+        self.last_eviction = time.monotonic()  # Time of the last eviction of idle accounts
+
+    def __contains__(self, account):
+        return account in self.states or self.backend.load(account) is not None
+
+    def __len__(self):
+        return len(self.states)
+
+    # Method to get the state of an account, loading or creating it on first access
+    def get(self, account):
+        state = self.states.get(account)
+        if state is None:
+            data = self.backend.load(account)
+            state = decode_state(data) if data is not None else new_account_state()
+            self.states[account] = state
+        state.touch()
+        return state
+
+    # Method to get the states of several accounts, keyed by email
+    def states_for(self, accounts):
+        return {account: self.get(account) for account in accounts}
+
+    # Method to mark accounts whose state changed
+    def mark_dirty(self, accounts):
+        self.dirty.update(accounts)
+
+    # Method to forget the state of an account, in memory and in the backend
+    def evict(self, account):
+        self.states.pop(account, None)
+        self.dirty.discard(account)
+        self.backend.delete([account])
+
+    # Method to drop from memory the accounts idle for longer than the TTL, their state stays in a persistent
+    # backend and is forgotten with an in-memory one, which would otherwise keep every account ever seen
+    def evict_idle(self):
+        if self.idle_ttl is None:
+            return []
+        deadline = time.monotonic() - self.idle_ttl
+        idle = [account for account, state in self.states.items() if state.last_seen < deadline]
+        if not idle:
+            return idle
+        if self.backend.persistent:
+            # Persist the idle accounts first, so they resume from their baseline when they come back
+            changed = {account: encode_state(self.states[account]) for account in idle if account in self.dirty}
+            if changed:
+                self.backend.save(changed)
+        else:
+            self.backend.delete(idle)
+        for account in idle:
+            del self.states[account]
+            self.dirty.discard(account)
+        return idle  # Return the evicted accounts
+
+    # Method to write the changed states to the backend
+    def flush(self):
+        if self.dirty:
+            self.backend.save({account: encode_state(self.states[account]) for account in self.dirty if account in self.states})
+            self.dirty = set()
+        self.last_flush = time.monotonic()
+
+    # Method to flush and drop the idle accounts when the flush interval has passed
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+            self.maybe_evict()
+
+    # Method to drop the idle accounts when the flush interval has passed since the last eviction,
+    # for callers that flush every cycle
+    def maybe_evict(self):
+        if time.monotonic() - self.last_eviction >= self.flush_interval:
+            self.evict_idle()
+            self.last_eviction = time.monotonic()
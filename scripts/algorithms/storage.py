@@ -0,0 +1,207 @@
+# Import necessary libraries
+import json  # Serialization of the local RawData records
+import sqlite3  # Local SQLite backend
+from algorithms.batch_writer import BatchWriter  # Batched Firestore writes
+from algorithms.metrics import metrics  # Firebase call counters
+
+# Every storage covers the three data paths of the pipeline:
+#   fetch() / commit()            RawData records newer than the committed positions, shaped like the "account" node,
+#                                 with only the accounts that have new records
+#   write_derived_data(email, d)  queue the DerivedData entries of an account, pushed by flush()
+#   increment_hotspots(rows)      add (coordinate key, lat, long, day, hour, count) rows to the Map stress scores
+
+# Function to build the DerivedData document of an entry
+def derived_document(entry):
+    return {
+        "binterval": [entry["lower_bound"], entry["upper_bound"]],
+        "stress_score": entry["stress_score"],
+        "timestamp": entry["timestamp"]
+    }
+
+# Define FirebaseStorage class
+class FirebaseStorage:
+    # Constructor with the Firestore client, the RawData fetcher and the Map node, None uses the default app
+    def __init__(self, db_firestore, fetcher=None, map_ref=None):
+        self.db_firestore = db_firestore  # Firestore client
+        self.fetcher = fetcher  # Incremental RawData fetcher or listener, None downloads every account
+        self.map_ref = map_ref  # The "Map" node of the Realtime Database
+        self.writer = BatchWriter(db_firestore)  # Groups DerivedData writes into batches
+
+    # Method to read the new RawData of every account
+    def fetch(self):
+        if self.fetcher is not None:
+            return self.fetcher.fetch()
+        from map.utils.firebase_app import reference  # Lazily initialized Firebase app
+        accounts = reference("account").get() or {}
+        metrics.firebase_call("rtdb_read", accounts)
+        return {account: account_data for account, account_data in accounts.items() if (account_data or {}).get("RawData")}
+
+    # Method to persist the positions of the records processed so far
+    def commit(self):
+        if self.fetcher is not None:
+            self.fetcher.commit()
+
+    # Method to queue the DerivedData entries of an account
+    def write_derived_data(self, email, derived_data):
+        derived_data_collection_ref = self.db_firestore.collection("account").document(email).collection("DerivedData")
+        for entry in derived_data:
+            self.writer.set(derived_data_collection_ref.document(str(entry["timestamp"])), derived_document(entry))
+
+    # Method to commit the queued writes
+    def flush(self):
+        self.writer.flush()
+
+    # Method to add counts to the Map stress scores, in one multi-path update with server-side increments
+    def increment_hotspots(self, rows):
+        updates = {}
+        for coord_key, lat, long, day, hour, count in rows:
+            updates[f'{coord_key}/lat'] = lat
+            updates[f'{coord_key}/long'] = long
+            hour_path = f'{coord_key}/days/{day}/hours/{hour}'
+            updates[f'{hour_path}/hour'] = hour
+            updates[f'{hour_path}/stress_score'] = {'.sv': {'increment': count}}
+        if updates:
+            if self.map_ref is None:
+                from map.utils.firebase_app import reference  # Lazily initialized Firebase app
+                self.map_ref = reference("Map")
+            self.map_ref.update(updates)
+            metrics.firebase_call("rtdb_update", updates)
+
+    # Method to reset the write counters of the cycle
+    def reset_stats(self):
+        self.writer.reset_stats()
+
+    # Method to describe the write counters of the cycle
+    def report(self):
+        return self.writer.report()
+
+# Define MemoryStorage class
+class MemoryStorage:
+    # Constructor, everything only lives as long as the process
+    def __init__(self):
+        self.raw_data = {}  # RawData records of each account, in key order
+        self.positions = {}  # Committed number of fetched records of each account
+        self.pending = {}  # Fetched but not committed numbers of records
+        self.derived_data = {}  # DerivedData documents of each email, keyed by timestamp
+        self.queued = []  # (email, entries) waiting for flush
+        self.hotspots = {}  # Stress score of each (coordinate key, day, hour)
+        self.coordinates = {}  # (lat, long) of each coordinate key
+        self.reset_stats()
+
+    # Method to add RawData in bulk, shaped like the "account" node; records at or before the last key are ignored
+    def add_raw_data(self, accounts):
+        for account, account_data in accounts.items():
+            records = self.raw_data.setdefault(account, [])
+            last_key = records[-1][0] if records else None
+            for key in sorted(account_data.get("RawData") or {}):
+                if last_key is None or key > last_key:
+                    records.append((key, account_data["RawData"][key]))
+                    last_key = key
+
+    # Method to read the RawData records newer than the committed positions, only the accounts that have some
+    def fetch(self):
+        accounts = {}
+        for account, records in self.raw_data.items():
+            start = self.positions.get(account, 0)
+            if start < len(records):
+                accounts[account] = {"RawData": dict(records[start:])}
+                self.pending[account] = len(records)
+        return accounts
+
+    # Method to persist the positions of the records processed so far
+    def commit(self):
+        self.positions.update(self.pending)
+        self.pending = {}
+
+    # Method to queue the DerivedData entries of an account
+    def write_derived_data(self, email, derived_data):
+        self.queued.append((email, derived_data))
+
+    # Method to apply the queued writes
+    def flush(self):
+        for email, derived_data in self.queued:
+            documents = self.derived_data.setdefault(email, {})
+            for entry in derived_data:
+                documents[str(entry["timestamp"])] = derived_document(entry)
+                self.writes += 1
+        self.queued = []
+
+    # Method to add counts to the Map stress scores
+    def increment_hotspots(self, rows):
+        for coord_key, lat, long, day, hour, count in rows:
+            self.coordinates[coord_key] = (lat, long)
+            self.hotspots[(coord_key, day, hour)] = self.hotspots.get((coord_key, day, hour), 0) + count
+
+    # Method to reset the write counters of the cycle
+    def reset_stats(self):
+        self.writes = 0  # Written DerivedData documents
+
+    # Method to describe the write counters of the cycle
+    def report(self):
+        return {"writes": self.writes}
+
+# Define SQLiteStorage class
+class SQLiteStorage:
+    # Constructor with the path of the database file, ":memory:" keeps it in memory
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS raw_data (account TEXT, key TEXT, record TEXT NOT NULL, PRIMARY KEY (account, key)) WITHOUT ROWID")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS raw_data_position (account TEXT PRIMARY KEY, key TEXT NOT NULL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS derived_data (account TEXT, timestamp INTEGER, lower_bound REAL, upper_bound REAL, stress_score REAL, PRIMARY KEY (account, timestamp)) WITHOUT ROWID")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS hotspot (coordinate TEXT, day TEXT, hour TEXT, lat REAL, long REAL, stress_score INTEGER NOT NULL, PRIMARY KEY (coordinate, day, hour)) WITHOUT ROWID")
+        self.pending = {}  # Last fetched but not committed key of each account
+        self.queued = []  # DerivedData rows waiting for flush
+        self.reset_stats()
+
+    # Method to add RawData in bulk, shaped like the "account" node; records already stored are ignored
+    def add_raw_data(self, accounts):
+        rows = [(account, key, json.dumps(record))
+                for account, account_data in accounts.items()
+                for key, record in (account_data.get("RawData") or {}).items()]
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO raw_data (account, key, record) VALUES (?, ?, ?)", rows)
+
+    # Method to read the RawData records newer than the committed positions, in one query
+    def fetch(self):
+        accounts = {}
+        rows = self.connection.execute(
+            "SELECT r.account, r.key, r.record FROM raw_data r LEFT JOIN raw_data_position p ON p.account = r.account "
+            "WHERE p.key IS NULL OR r.key > p.key ORDER BY r.account, r.key")
+        for account, key, record in rows:
+            accounts.setdefault(account, {"RawData": {}})["RawData"][key] = json.loads(record)
+            self.pending[account] = key
+        return accounts
+
+    # Method to persist the positions of the records processed so far
+    def commit(self):
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO raw_data_position (account, key) VALUES (?, ?)", self.pending.items())
+        self.pending = {}
+
+    # Method to queue the DerivedData entries of an account
+    def write_derived_data(self, email, derived_data):
+        self.queued.extend((email, entry["timestamp"], entry["lower_bound"], entry["upper_bound"], entry["stress_score"]) for entry in derived_data)
+
+    # Method to write the queued entries in one transaction
+    def flush(self):
+        if self.queued:
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO derived_data (account, timestamp, lower_bound, upper_bound, stress_score) VALUES (?, ?, ?, ?, ?)", self.queued)
+            self.writes += len(self.queued)
+            self.queued = []
+
+    # Method to add counts to the Map stress scores in one transaction
+    def increment_hotspots(self, rows):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO hotspot (coordinate, lat, long, day, hour, stress_score) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (coordinate, day, hour) DO UPDATE SET stress_score = stress_score + excluded.stress_score", rows)
+
+    # Method to reset the write counters of the cycle
+    def reset_stats(self):
+        self.writes = 0  # Written DerivedData rows
+
+    # Method to describe the write counters of the cycle
+    def report(self):
+        return {"writes": self.writes}
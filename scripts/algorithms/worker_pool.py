@@ -0,0 +1,121 @@
+# Import necessary libraries
+import logging  # Leveled logging
+import os  # Operating system functions
+import zlib  # Stable hash of the account keys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor  # Process and thread pools
+from algorithms.data_manipulation import DataProcessor  # Custom class for data manipulation
+from algorithms.range_based import DEFAULT_K  # Default width of the range-based interval
+from algorithms.state_store import StateStore, SQLiteBackend  # Persistent state of the accounts
+from algorithms.storage import FirebaseStorage  # DerivedData writes on Firebase
+from algorithms.batch_writer import BatchWriteError  # Raised when derived data could not be written
+from algorithms.metrics import metrics  # Stage timers and counters, shipped from the workers to the parent
+
+logger = logging.getLogger(__name__)
+
+# State of the worker process, each account is always scored by the same worker
+_store = None  # Previous data of the accounts of this worker
+_processor = None  # DataProcessor of this worker
+
+# Function to get the state store of the worker, opened on first use
+def worker_store(state_path, idle_ttl=None):
+    global _store
+    if _store is None:
+        _store = StateStore(SQLiteBackend(state_path) if state_path else None, idle_ttl=idle_ttl)
+    return _store
+
+# Function run in the worker process to score a shard of accounts,
+# returning the derived data and the metrics the worker recorded meanwhile
+def score_shard(accounts_dict, state_path=None, k=DEFAULT_K, idle_ttl=None):
+    global _processor
+    if _processor is None:
+        _processor = DataProcessor(None, k=k)  # Scoring does not use Firestore
+
+    # Every account is scored against its own previous data, looked up by email
+    store = worker_store(state_path, idle_ttl)
+    with metrics.timer("score_shard"):
+        results = _processor.score_accounts(accounts_dict, store)
+    metrics.increment("derived_samples", sum(len(entries) for entries in results.values()))
+
+    # The state is flushed by flush_shard before the cycle is committed
+    store.mark_dirty(accounts_dict)
+    store.maybe_evict()
+    return results, metrics.drain()
+
+# Function run in the worker process to persist the state of its accounts
+def flush_shard(state_path=None, idle_ttl=None):
+    worker_store(state_path, idle_ttl).flush()
+
+# Function run in an I/O thread to write a chunk of derived data, with the storage of its slot
+def write_chunk(storage, chunk):
+    storage.reset_stats()
+    for email, derived_data in chunk.items():
+        storage.write_derived_data(email, derived_data)
+    storage.flush()  # Also retries the writes a previous cycle could not commit
+    return storage.report()
+
+# Define WorkerPool class
+class WorkerPool:
+    # Constructor with the Firestore client and the number of workers
+    def __init__(self, db_firestore, workers=None, io_workers=8, state_path=None, k=DEFAULT_K, idle_ttl=None):
+        self.db_firestore = db_firestore  # Firestore client used by the writers
+        self.k = k  # Width of the range-based interval
+        self.idle_ttl = idle_ttl  # Seconds without data before a worker drops an account's state from memory
+        self.state_path = state_path  # SQLite file with the state of the accounts, None keeps it in memory
+        workers = workers or os.cpu_count() or 1  # Number of scoring processes
+        # One single-process executor per shard, so the state of an account stays in one process
+        self.shards = [ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+        self.io = ThreadPoolExecutor(max_workers=io_workers)  # Threads for the Firebase I/O
+        # One storage per I/O slot, kept across cycles, so each batch writer is used by one thread at a time
+        self.storages = [FirebaseStorage(db_firestore) for _ in range(io_workers)]
+
+    # Method to get the shard of an account
+    def shard_of(self, email):
+        return zlib.crc32(email.encode()) % len(self.shards)
+
+    # Method to score the accounts of a cycle, each shard in its own process
+    def create_derived_data(self, accounts_dict):
+        parts = [{} for _ in self.shards]
+        for email, account_data in accounts_dict.items():
+            parts[self.shard_of(email)][email] = account_data
+
+        futures = [shard.submit(score_shard, part, self.state_path, self.k, self.idle_ttl) for shard, part in zip(self.shards, parts) if part]
+
+        results = {}  # Dictionary to store derived data for each account
+        for future in futures:
+            shard_results, shard_metrics = future.result()
+            results.update(shard_results)
+            metrics.merge(shard_metrics)  # The parent exports the metrics of the workers too
+        return results  # Return derived data for all accounts
+
+    # Method to write the derived data of a cycle to Firestore from several threads,
+    # raising BatchWriteError when a writer gives up, once every thread is done
+    def add_data_to_firestore(self, data):
+        chunks = [{} for _ in self.storages]
+        for i, (email, derived_data) in enumerate(data.items()):
+            chunks[i % len(chunks)][email] = derived_data
+
+        # Every slot is flushed, the ones without new data may hold writes of a failed cycle
+        futures = [self.io.submit(write_chunk, storage, chunk) for storage, chunk in zip(self.storages, chunks)]
+        reports = []
+        errors = []
+        for future in futures:
+            try:
+                reports.append(future.result())
+            except BatchWriteError as e:
+                errors.append(e)
+        if reports:
+            logger.info("Sent derived data: %s", {key: sum(report[key] for report in reports) for key in reports[0]})
+        if errors:
+            raise errors[0]
+
+    # Method to persist the state of the accounts of every worker
+    def flush_state(self):
+        for future in [shard.submit(flush_shard, self.state_path, self.idle_ttl) for shard in self.shards]:
+            future.result()
+
+    # Method to stop the workers and the writers. The state is not flushed here,
+    # it is persisted with every committed cycle and must not get ahead of the checkpoint
+    def shutdown(self):
+        for shard in self.shards:
+            shard.shutdown()
+        self.io.shutdown()
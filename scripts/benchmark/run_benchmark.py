@@ -0,0 +1,132 @@
+# Replay synthetic wearable data through the scoring pipeline, with Firebase replaced by local fakes.
+# Run from the scripts directory: python -m benchmark.run_benchmark --accounts 10 1000
+import argparse  # Command line arguments
+import contextlib  # Silencing the pipeline output
+import io  # In-memory text stream
+import json  # Machine-readable results
+import platform  # Python version of the run
+import subprocess  # Commit of the run
+import time  # Module for time-related functions
+import tracemalloc  # Peak memory measurement
+import numpy as np  # Numerical computing library
+from algorithms.data_manipulation import DataProcessor  # Custom class for data manipulation
+from algorithms.raw_data_fetcher import RawDataFetcher  # Incremental RawData download
+from algorithms.state_store import StateStore  # State of the accounts
+from algorithms.storage import MemoryStorage, SQLiteStorage  # Local stand-ins for Firebase
+from benchmark.synthetic import SyntheticWearables  # Synthetic wearable generator
+from fakes.firestore import FakeFirestore  # In-memory Firestore
+from fakes.realtime_database import FakeDatabase  # In-memory Realtime Database
+from map.models.Map import Map  # Custom module for mapping data
+from map.utils.grid import DecimalGrid  # Grid used to bucket hotspot coordinates
+
+STAGES = ("fetch", "score", "map", "write")  # Stages of a cycle, in order
+DEFAULT_SCALES = (10, 1000, 100000)  # Numbers of simulated accounts
+DEFAULT_CYCLES = 8  # The first four cycles only fill the 120 sample baselines
+STORAGES = ("fakes", "memory", "sqlite")  # Firebase fakes, or the local storages of the pipeline
+
+# Function to summarize the durations of a stage, in milliseconds
+def percentiles(durations):
+    p50, p95, p99 = np.percentile(np.array(durations) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3), "total_ms": round(sum(durations) * 1000, 3)}
+
+# Function to replay a number of accounts through the pipeline
+def run_scale(n_accounts, cycles, seed=0, trace_memory=True, storage="fakes"):
+    wearables = SyntheticWearables(n_accounts, seed)
+    database = FakeDatabase()
+    client = FakeFirestore()
+    if storage == "fakes":
+        local = None
+        processor = DataProcessor(client, RawDataFetcher(database.reference("account")))
+    else:
+        local = MemoryStorage() if storage == "memory" else SQLiteStorage(":memory:")
+        processor = DataProcessor(None, storage=local)
+    store = StateStore()
+    hotspots = Map(DecimalGrid(4), database.reference("Map"), storage=local)
+
+    durations = {stage: [] for stage in STAGES}
+    samples = 0
+    derived = 0
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    for cycle in range(cycles):
+        # The app replaces each RawData node with the last 30 seconds of samples
+        if local is None:
+            database.reference("account").update(wearables.next_account_node())
+        else:
+            local.add_raw_data(wearables.next_account_node())
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            raw_data = processor.get_recent_raw_data()
+            fetched = time.perf_counter()
+
+            derived_data = processor.create_derived_data(processor.adapt_recent_raw_data(raw_data), store)
+            store.mark_dirty(raw_data)
+            scored = time.perf_counter()
+
+            hotspots.parse_derived_data(processor.extract_derived_data_for_map(derived_data))
+            mapped = time.perf_counter()
+
+            processor.add_data_to_firestore(derived_data, {})
+            processor.fetcher.commit()
+            written = time.perf_counter()
+
+        for stage, duration in zip(STAGES, (fetched - start, scored - fetched, mapped - scored, written - mapped)):
+            durations[stage].append(duration)
+        samples += sum(len(records) for records in raw_data.values())
+        derived += sum(len(entries) for entries in derived_data.values())
+
+    peak_memory = None
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    total = sum(sum(stage_durations) for stage_durations in durations.values())
+    return {
+        "accounts": n_accounts,
+        "storage": storage,
+        "cycles": cycles,
+        "samples": samples,
+        "derived_samples": derived,
+        "seconds": round(total, 3),
+        "samples_per_second": round(samples / total, 1) if total else None,
+        "stages": {stage: percentiles(durations[stage]) for stage in STAGES},
+        "peak_memory_bytes": peak_memory,
+        "firebase_calls": {"realtime_database": database.calls, "firestore": client.calls}
+    }
+
+# Function to get the commit the benchmark runs on
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic wearables through the scoring pipeline.")
+    parser.add_argument("--accounts", type=int, nargs="+", default=list(DEFAULT_SCALES), help="numbers of simulated accounts")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES, help="30 second cycles replayed per scale")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc, which slows the run down")
+    parser.add_argument("--storage", choices=STORAGES, default="fakes", help="Firebase fakes or a local storage")
+    parser.add_argument("--output", default="benchmark_results.json", help="file the results are written to")
+    args = parser.parse_args()
+
+    results = []
+    for n_accounts in args.accounts:
+        result = run_scale(n_accounts, args.cycles, args.seed, not args.no_memory, args.storage)
+        print(f"{n_accounts} accounts: {result['samples_per_second']} samples/s, peak memory {result['peak_memory_bytes']} bytes")
+        results.append(result)
+
+    with open(args.output, "w") as output_file:
+        json.dump({
+            "commit": current_commit(),
+            "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "results": results
+        }, output_file, indent=2)
+
+if __name__ == "__main__":
+    main()
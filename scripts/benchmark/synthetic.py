@@ -0,0 +1,77 @@
+# Import necessary libraries
+import numpy as np  # Numerical computing library
+from algorithms.keytranslator import encode_key  # Account key of an email
+
+SAMPLES_PER_CYCLE = 30  # The watch sends 30 seconds of data at a time
+SAMPLE_PERIOD_MS = 1000  # One sample per second
+CITY_CENTER = (43.7228, 10.4017)  # Center of the simulated GPS traces
+
+# Define SyntheticWearables class
+class SyntheticWearables:
+    # Constructor with the number of wearers and the stress episode parameters
+    def __init__(self, n_accounts, seed=0, start_timestamp=1715323304365, episode_probability=0.05, episode_length=120):
+        self.rng = np.random.default_rng(seed)  # Random generator
+        self.n_accounts = n_accounts  # Number of simulated wearers
+        self.emails = [f"wearer{i}@chillin.app" for i in range(n_accounts)]  # Emails of the wearers
+        self.keys = [encode_key(email) for email in self.emails]  # Realtime Database keys
+        self.episode_probability = episode_probability  # Chance per cycle that a stress episode starts
+        self.episode_length = episode_length  # Samples of a stress episode
+        self.timestamp = start_timestamp  # Timestamp of the next sample, in milliseconds
+
+        # Personal resting values of each wearer
+        self.heartrate_rest = self.rng.normal(70, 6, n_accounts)
+        self.temperature_rest = self.rng.normal(33.5, 0.4, n_accounts)
+        self.eda_rest = self.rng.lognormal(0.5, 0.3, n_accounts)
+        # Each wearer starts somewhere within a few kilometers of the center
+        self.latitude = CITY_CENTER[0] + self.rng.normal(0, 0.02, n_accounts)
+        self.longitude = CITY_CENTER[1] + self.rng.normal(0, 0.02, n_accounts)
+        self.episode_left = np.zeros(n_accounts, dtype=int)  # Samples left in the current episode
+
+    # Method to generate the next cycle of samples, as (accounts x samples) arrays
+    def next_cycle(self, samples=SAMPLES_PER_CYCLE):
+        shape = (self.n_accounts, samples)
+
+        # Start new stress episodes and mark which samples fall inside one
+        starting = (self.episode_left == 0) & (self.rng.random(self.n_accounts) < self.episode_probability)
+        self.episode_left[starting] = self.episode_length
+        stressed = np.arange(samples)[None, :] < self.episode_left[:, None]
+        self.episode_left = np.maximum(self.episode_left - samples, 0)
+
+        # Stress raises heart rate and EDA and lowers skin temperature
+        heartrate = self.heartrate_rest[:, None] + self.rng.normal(0, 2, shape) + 25 * stressed
+        temperature = self.temperature_rest[:, None] + self.rng.normal(0, 0.05, shape) - 0.6 * stressed
+        eda = self.eda_rest[:, None] + np.abs(self.rng.normal(0, 0.1, shape)) + 3 * stressed
+
+        # GPS is a random walk, updated every sample
+        latitude = self.latitude[:, None] + np.cumsum(self.rng.normal(0, 0.00002, shape), axis=1)
+        longitude = self.longitude[:, None] + np.cumsum(self.rng.normal(0, 0.00002, shape), axis=1)
+        self.latitude = latitude[:, -1]
+        self.longitude = longitude[:, -1]
+
+        timestamps = self.timestamp + SAMPLE_PERIOD_MS * np.arange(samples)
+        self.timestamp += SAMPLE_PERIOD_MS * samples
+
+        return {
+            "heartRateSensor": heartrate,
+            "skinTemperatureSensor": temperature,
+            "edaSensor": eda,
+            "latitude": latitude,
+            "longitude": longitude,
+            "timestamp": timestamps,
+            "stressed": stressed
+        }
+
+    # Method to generate the next cycle shaped like the "account" node of the Realtime Database
+    def next_account_node(self, samples=SAMPLES_PER_CYCLE):
+        cycle = self.next_cycle(samples)
+        fields = ("heartRateSensor", "skinTemperatureSensor", "edaSensor", "latitude", "longitude")
+        columns = {field: cycle[field].tolist() for field in fields}
+        timestamps = cycle["timestamp"].tolist()
+
+        node = {}
+        for row, key in enumerate(self.keys):
+            node[key] = {"RawData": {
+                str(timestamp): dict({field: columns[field][row][i] for field in fields}, timestamp=timestamp)
+                for i, timestamp in enumerate(timestamps)
+            }}
+        return node
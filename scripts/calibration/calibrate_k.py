@@ -0,0 +1,86 @@
+# Choose the k of the range-based check on labelled heart rate datasets.
+# Run from the scripts directory: python -m calibration.calibrate_k data/participants.csv
+import argparse  # Command line arguments
+import json  # Calibrated k file
+import os  # Operating system functions
+import time  # Module for time-related functions
+from concurrent.futures import ProcessPoolExecutor  # Participants are evaluated in parallel
+import numpy as np  # Numerical computing library
+import pandas as pd  # Data manipulation library
+from algorithms.range_based import BayesianAnalyzer, K_GRID  # Range-based algorithm and the k values to try
+
+DEFAULT_OUTPUT = "calibrated_k.json"  # File read by load_k in production
+
+# Function to load the labelled datasets, CSV or Parquet by extension
+def load_datasets(paths):
+    frames = []
+    for path in paths:
+        if path.endswith((".parquet", ".pq")):
+            frames.append(pd.read_parquet(path))
+        else:
+            frames.append(pd.read_csv(path))
+    return pd.concat(frames, ignore_index=True)
+
+# Function run in a worker process to evaluate the k grid on one participant
+def evaluate_participant(participant_id, heartrate, labels, k_grid, n_train, seed):
+    analyzer = BayesianAnalyzer(seed=seed)
+    return participant_id, analyzer.evaluate_k_grid(heartrate, labels, k_grid, n_train)
+
+# Function to evaluate the k grid on every participant, fanned out across processes
+def calibrate(df, k_grid=K_GRID, n_train=120, workers=None, seed=0,
+              participant_column="Participant", heartrate_column="HR", label_column="Label"):
+    groups = list(df.groupby(participant_column, sort=False))
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(evaluate_participant, participant_id,
+                               group[heartrate_column].to_numpy(dtype=float), group[label_column].to_numpy(),
+                               k_grid, n_train, seed + i)
+                   for i, (participant_id, group) in enumerate(groups)]
+        results = [future.result() for future in futures]
+
+    # Participants shorter than the training window have no accuracy
+    participants = {participant_id: accuracies for participant_id, accuracies in results if not np.isnan(accuracies).all()}
+    if not participants:
+        raise ValueError(f"No participant has more than {n_train} samples")
+    aggregate = np.mean(np.stack(list(participants.values())), axis=0)
+    best = int(np.argmax(aggregate))
+
+    return {
+        "k": float(k_grid[best]),
+        "accuracy": float(aggregate[best]),
+        "n_train": n_train,
+        "k_grid": [float(k) for k in k_grid],
+        "aggregate_accuracy": [round(float(accuracy), 4) for accuracy in aggregate],
+        "participants": {
+            str(participant_id): {
+                "best_k": float(k_grid[int(np.argmax(accuracies))]),
+                "best_accuracy": round(float(np.max(accuracies)), 4),
+                "accuracy_at_k": round(float(accuracies[best]), 4)
+            } for participant_id, accuracies in participants.items()
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Choose the k of the range-based check on labelled heart rate data.")
+    parser.add_argument("datasets", nargs="+", help="CSV or Parquet files with Participant, HR and Label columns")
+    parser.add_argument("--n-train", type=int, default=120, help="training samples of each participant, 120 in production")
+    parser.add_argument("--k", type=float, nargs="+", default=list(K_GRID), help="k values to try")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, one per CPU by default")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the posterior draws")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="file the chosen k is written to")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = calibrate(load_datasets(args.datasets), np.array(args.k), args.n_train, args.workers, args.seed)
+
+    for participant_id, participant in result["participants"].items():
+        print(f"{participant_id}: best k {participant['best_k']:.4f} ({participant['best_accuracy']:.3f}), "
+              f"{participant['accuracy_at_k']:.3f} at the chosen k")
+    for k, accuracy in zip(result["k_grid"], result["aggregate_accuracy"]):
+        print(f"k {k:.4f}: mean accuracy {accuracy:.3f}")
+    print(f"Chosen k {result['k']:.4f} ({result['accuracy']:.3f}) in {time.perf_counter() - start:.1f} s")
+
+    with open(args.output, "w") as output_file:
+        json.dump(result, output_file, indent=2)
+
+if __name__ == "__main__":
+    main()
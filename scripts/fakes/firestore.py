@@ -0,0 +1,226 @@
+import copy
+
+
+class Increment:
+    """
+    This class mimics the firestore.Increment transform.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+# mimics firestore.DELETE_FIELD, the field is removed by a merge
+DELETE_FIELD = object()
+
+
+def _resolve(current, value):
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) else 0) + value.value
+    if isinstance(value, dict):
+        return {key: _resolve(None, child) for key, child in value.items() if child is not DELETE_FIELD}
+    return copy.deepcopy(value)
+
+
+def _merge(target, source):
+    for key, value in source.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve(target.get(key), value)
+
+
+class FakeFirestore:
+    """
+    This class is an in-memory stand-in for a Firestore client.
+    """
+
+    def __init__(self):
+        """
+        Initialize a FakeFirestore object.
+
+        Returns:
+            None
+        """
+        self.documents = {}
+        self.calls = 0
+
+    def collection(self, name):
+        """
+        Get a top level collection.
+
+        Args:
+            name (str): The name of the collection.
+
+        Returns:
+            FakeCollection: The collection.
+        """
+        return FakeCollection(self, name)
+
+    def batch(self):
+        """
+        Start a write batch.
+
+        Returns:
+            FakeWriteBatch: The batch.
+        """
+        return FakeWriteBatch(self)
+
+
+class FakeCollection:
+    """
+    This class mimics a Firestore CollectionReference.
+    """
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+
+    def document(self, document_id):
+        """
+        Get a document of the collection.
+
+        Args:
+            document_id (str): The id of the document.
+
+        Returns:
+            FakeDocument: The document.
+        """
+        return FakeDocument(self.client, f'{self.path}/{document_id}')
+
+    def stream(self):
+        """
+        Read every document of the collection.
+
+        Returns:
+            list: The snapshots of the documents.
+        """
+        self.client.calls += 1
+        prefix = self.path + '/'
+        return [
+            FakeSnapshot(path, data)
+            for path, data in sorted(self.client.documents.items())
+            if path.startswith(prefix) and '/' not in path[len(prefix):]
+        ]
+
+
+class FakeDocument:
+    """
+    This class mimics a Firestore DocumentReference.
+    """
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.split('/')[-1]
+
+    def collection(self, name):
+        """
+        Get a subcollection of the document.
+
+        Args:
+            name (str): The name of the subcollection.
+
+        Returns:
+            FakeCollection: The subcollection.
+        """
+        return FakeCollection(self.client, f'{self.path}/{name}')
+
+    def get(self):
+        """
+        Read the document.
+
+        Returns:
+            FakeSnapshot: The snapshot of the document.
+        """
+        self.client.calls += 1
+        return FakeSnapshot(self.path, self.client.documents.get(self.path))
+
+    def set(self, data, merge=False):
+        """
+        Write the document.
+
+        Args:
+            data (dict): The fields of the document.
+            merge (bool): Merge the fields into the existing document.
+
+        Returns:
+            None
+        """
+        self.client.calls += 1
+        self._apply(data, merge)
+
+    def delete(self):
+        """
+        Delete the document.
+
+        Returns:
+            None
+        """
+        self.client.calls += 1
+        self.client.documents.pop(self.path, None)
+
+    def _apply(self, data, merge):
+        if merge and self.path in self.client.documents:
+            _merge(self.client.documents[self.path], data)
+        else:
+            self.client.documents[self.path] = _resolve(None, data)
+
+
+class FakeSnapshot:
+    """
+    This class mimics a Firestore DocumentSnapshot.
+    """
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = copy.deepcopy(data)
+
+    @property
+    def id(self):
+        return self.path.split('/')[-1]
+
+    @property
+    def exists(self):
+        return self.data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self.data)
+
+
+class FakeWriteBatch:
+    """
+    This class mimics a Firestore WriteBatch. Operations are applied on commit.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    def set(self, doc_ref, data, merge=False):
+        self.operations.append((doc_ref, data, merge))
+
+    def delete(self, doc_ref):
+        self.operations.append((doc_ref, None, False))
+
+    def commit(self):
+        """
+        Apply every operation of the batch in one call.
+
+        Returns:
+            None
+        """
+        if len(self.operations) > 500:
+            raise ValueError('A batch can hold at most 500 operations')
+        self.client.calls += 1
+        for doc_ref, data, merge in self.operations:
+            if data is None:
+                self.client.documents.pop(doc_ref.path, None)
+            else:
+                doc_ref._apply(data, merge)
+        self.operations = []
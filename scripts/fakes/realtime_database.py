@@ -0,0 +1,324 @@
+import copy
+
+
+class FakeDatabase:
+    """
+    This class is an in-memory stand-in for a Firebase Realtime Database.
+    """
+
+    def __init__(self, data=None):
+        """
+        Initialize a FakeDatabase object.
+
+        Args:
+            data (dict): The initial content of the database.
+
+        Returns:
+            None
+        """
+        self.data = copy.deepcopy(data) if data is not None else {}
+        self.calls = 0
+        self.listeners = []
+
+    def reference(self, path=''):
+        """
+        Get a reference to a path of the database.
+
+        Args:
+            path (str): The path, with segments separated by '/'.
+
+        Returns:
+            FakeReference: The reference to the path.
+        """
+        return FakeReference(self, path)
+
+
+    def notify(self, segments, value):
+        """
+        Send a put event to the listeners of the written path and of its parents.
+
+        Args:
+            segments (list): The written path.
+            value (object): The written value.
+
+        Returns:
+            None
+        """
+        for listener in list(self.listeners):
+            listener_segments = _split(listener.path)
+            if segments[:len(listener_segments)] == listener_segments:
+                relative = segments[len(listener_segments):]
+                listener.callback(FakeEvent('put', '/' + '/'.join(relative), copy.deepcopy(value)))
+
+
+def _split(path):
+    return [segment for segment in path.split('/') if segment]
+
+
+class FakeEvent:
+    """
+    This class mimics firebase_admin.db.Event.
+    """
+
+    def __init__(self, event_type, path, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class FakeListenerRegistration:
+    """
+    This class mimics firebase_admin.db.ListenerRegistration. Events are delivered synchronously.
+    """
+
+    def __init__(self, database, path, callback):
+        self.database = database
+        self.path = path
+        self.callback = callback
+
+    def close(self):
+        """
+        Stop delivering events.
+
+        Returns:
+            None
+        """
+        if self in self.database.listeners:
+            self.database.listeners.remove(self)
+
+
+class FakeReference:
+    """
+    This class mimics the subset of firebase_admin.db.Reference used by the scripts.
+    """
+
+    def __init__(self, database, path=''):
+        """
+        Initialize a FakeReference object.
+
+        Args:
+            database (FakeDatabase): The database the reference points into.
+            path (str): The path of the reference.
+
+        Returns:
+            None
+        """
+        self.database = database
+        self.path = '/'.join(_split(path))
+
+    @property
+    def key(self):
+        """
+        Get the last segment of the path.
+
+        Returns:
+            str: The key of the reference, None for the root.
+        """
+        segments = _split(self.path)
+        return segments[-1] if segments else None
+
+    def child(self, path):
+        """
+        Get a reference to a child path.
+
+        Args:
+            path (str): The path relative to this reference.
+
+        Returns:
+            FakeReference: The reference to the child.
+        """
+        return FakeReference(self.database, f'{self.path}/{path}')
+
+    def _node(self):
+        node = self.database.data
+        for segment in _split(self.path):
+            if not isinstance(node, dict) or segment not in node:
+                return None
+            node = node[segment]
+        return node
+
+    def get(self, shallow=False):
+        """
+        Read the value at the reference.
+
+        Args:
+            shallow (bool): Only return the keys of the children, mapped to True.
+
+        Returns:
+            object: A copy of the value, None if the path does not exist.
+        """
+        self.database.calls += 1
+        node = self._node()
+        if shallow and isinstance(node, dict):
+            return {key: True for key in node}
+        return copy.deepcopy(node)
+
+    def set(self, value):
+        """
+        Overwrite the value at the reference.
+
+        Args:
+            value (object): The new value, None deletes the path.
+
+        Returns:
+            None
+        """
+        self.database.calls += 1
+        self._write(_split(self.path), value)
+
+    def update(self, value):
+        """
+        Write several children at once. Keys may be paths relative to the reference.
+
+        Args:
+            value (dict): The children to write.
+
+        Returns:
+            None
+        """
+        self.database.calls += 1
+        base = _split(self.path)
+        for key, child_value in value.items():
+            self._write(base + _split(key), child_value)
+
+    def delete(self):
+        """
+        Delete the value at the reference.
+
+        Returns:
+            None
+        """
+        self.set(None)
+
+    def transaction(self, transaction_update):
+        """
+        Atomically replace the value at the reference with a function of the current one.
+
+        Args:
+            transaction_update (function): Gets the current value and returns the new one.
+
+        Returns:
+            object: The new value.
+        """
+        new_value = transaction_update(self.get())
+        self.set(new_value)
+        return new_value
+
+    def listen(self, callback):
+        """
+        Deliver the current value and every later write below the reference to a callback.
+
+        Args:
+            callback (function): Gets a FakeEvent for each change.
+
+        Returns:
+            FakeListenerRegistration: The registration, closed to stop listening.
+        """
+        registration = FakeListenerRegistration(self.database, self.path, callback)
+        callback(FakeEvent('put', '/', self.get()))
+        self.database.listeners.append(registration)
+        return registration
+
+    def _write(self, segments, value):
+        self._store(segments, value)
+        self.database.notify(segments, value)
+
+    def _store(self, segments, value):
+        if not segments:
+            self.database.data = copy.deepcopy(value) if isinstance(value, dict) else {}
+            return
+        node = self.database.data
+        for segment in segments[:-1]:
+            if not isinstance(node.get(segment), dict):
+                if value is None:
+                    return
+                node[segment] = {}
+            node = node[segment]
+        if value is None:
+            node.pop(segments[-1], None)
+        elif isinstance(value, dict) and '.sv' in value:
+            # server value, only the increment transform is supported
+            current = node.get(segments[-1])
+            node[segments[-1]] = (current if isinstance(current, (int, float)) else 0) + value['.sv']['increment']
+        else:
+            node[segments[-1]] = copy.deepcopy(value)
+
+    def order_by_key(self):
+        """
+        Start a query on the children of the reference, ordered by key.
+
+        Returns:
+            FakeQuery: The query.
+        """
+        return FakeQuery(self, None)
+
+    def order_by_child(self, path):
+        """
+        Start a query on the children of the reference, ordered by a child value.
+
+        Args:
+            path (str): The child used for ordering.
+
+        Returns:
+            FakeQuery: The query.
+        """
+        return FakeQuery(self, path)
+
+
+class FakeQuery:
+    """
+    This class mimics firebase_admin.db.Query for key and child ordering.
+    """
+
+    def __init__(self, reference, order_by):
+        self.reference = reference
+        self.order_by = order_by
+        self.start = None
+        self.end = None
+        self.first = None
+        self.last = None
+
+    def start_at(self, start):
+        self.start = start
+        return self
+
+    def end_at(self, end):
+        self.end = end
+        return self
+
+    def limit_to_first(self, limit):
+        self.first = limit
+        return self
+
+    def limit_to_last(self, limit):
+        self.last = limit
+        return self
+
+    def _order(self, item):
+        key, value = item
+        if self.order_by is None:
+            return key
+        for segment in _split(self.order_by):
+            value = value.get(segment) if isinstance(value, dict) else None
+        return value
+
+    def get(self):
+        """
+        Run the query.
+
+        Returns:
+            dict: The matching children in query order.
+        """
+        node = self.reference.get()
+        if not isinstance(node, dict):
+            return {}
+        items = sorted(node.items(), key=self._order)
+        if self.start is not None:
+            items = [item for item in items if self._order(item) >= self.start]
+        if self.end is not None:
+            items = [item for item in items if self._order(item) <= self.end]
+        if self.first is not None:
+            items = items[:self.first]
+        if self.last is not None:
+            items = items[-self.last:]
+        return dict(items)
@@ -1,63 +1,136 @@
 # Import necessary modules and classes
+import logging  # Leveled logging
 import time  # Module for time-related functions
 from algorithms.data_manipulation import DataProcessor
-import firebase_admin# Custom module for data manipulation
-from firebase_admin import db
-from firebase_admin import credentials, firestore  # Sub-modules for Firebase Admin SDK
+from algorithms.state_store import StateStore, SQLiteBackend  # Persistent state of the accounts
+from algorithms.raw_data_fetcher import RawDataFetcher, CheckpointStore  # Incremental RawData download
+from algorithms.raw_data_listener import RawDataListener  # Push-based RawData ingestion
+from algorithms.worker_pool import WorkerPool  # Parallel scoring and writing of the accounts
+from algorithms.metrics import metrics  # Stage timers and counters
+from algorithms.range_based import load_k  # k chosen by the calibration
+from algorithms.cleaning import SampleCleaner  # Ordering, deduplication and filling of the raw samples
+from algorithms.batch_writer import BatchWriteError  # Raised when derived data could not be written
+from map.utils.firebase_app import firestore_client, reference  # Lazily initialized Firebase app
 from map.models.Map import Map  # Custom module for mapping data
-MAX_IDENTICAL_DATA_REPETITIONS = 5
+from map.utils.grid import DecimalGrid  # Grid used to bucket hotspot coordinates
+INGESTION_MODE = "listen"  # "listen" for RawData events, "poll" to fetch every POLL_INTERVAL seconds
+POLL_INTERVAL = 40  # Seconds between two fetches when polling
+CHECKPOINT_PATH = "./raw_data_checkpoint.json"  # Last processed RawData key of each account
+STATE_PATH = "./account_state.sqlite"  # Baseline and carry-over of each account
+K_PATH = "./calibrated_k.json"  # Written by python -m calibration.calibrate_k, the default k is used without it
+STATE_IDLE_TTL = 3600  # Seconds without data before an account's state leaves memory, it stays on disk
+RESAMPLE_PERIOD = None  # Milliseconds between two cleaned samples, None keeps the samples as sent by the watch
+MAX_FILL_GAP = 10000  # Longest gap in milliseconds between valid readings that is interpolated, samples in longer ones are dropped
+MAP_GRID_DIGITS = 4  # Decimal digits of the hotspot grid, about 11 meters
+MAP_TIMEZONE = "Europe/Rome"  # Timezone of the hotspot day and hour keys, None uses the server's one
+SCORING_WORKERS = 4  # Processes scoring the accounts, 0 scores them serially in this process
+IO_WORKERS = 8  # Threads writing the derived data to Firestore
+STREAMING = True  # Without workers, process one account at a time from fetch to write
+METRICS_PORT = 9100  # Port of the Prometheus endpoint, None disables it
+METRICS_LOG_INTERVAL = 60  # Seconds between two JSON metrics log lines
+LOG_LEVEL = logging.INFO  # DEBUG also logs a sample of the processed data
 
+logger = logging.getLogger("main_routine")
 
-identical_data_count = 0
-previous_raw_data = None
-def main_routine():
-    # Initialize an empty dictionary to store previous data for each email
-    predata = {}
+
+def main_routine(db_firestore=None):
+    # Firestore client, created on first use unless one is given
+    db_firestore = db_firestore if db_firestore is not None else firestore_client()
     data_prec={}
     # Create an instance of the Map class
-    map = Map()
-
-    # Infinite loop to continuously process data
-    while True:
-        # Create a DataProcessor object with the Firestore client 'db'
-        processor = DataProcessor(db_firestore)
-        # Retrieve recent raw data from Firestore
-        recent_raw_data = processor.get_recent_raw_data(identical_data_count,previous_raw_data,MAX_IDENTICAL_DATA_REPETITIONS)
-
-        # Iterate through the recent raw data
-        for email, account_data in recent_raw_data.items():
-            # If email not in predata, initialize data structures
-            if email not in predata:
-                init_data = []  # Initialize list for initial data
-                next_data = []  # Initialize list for subsequent data
-                # Create a dictionary to store initial and subsequent data
-                data = {
-                    "init_data": init_data,
-                    "next_data": next_data
-                }
-                # Store data dictionary for the email in predata
-                predata[email] = data
-
-        # Process raw data to derive meaningful information
-        derived_data = processor.create_derived_data(processor.adapt_recent_raw_data(recent_raw_data), predata)
-        # Extract derived data specific for Map
-        extracted_data = processor.extract_derived_data_for_map(derived_data)
-        # Parse extracted data into the Map object
-        map.parse_derived_data(extracted_data)
-
-
-        # Add derived data to Firestore
-        processor.add_data_to_firestore(derived_data,data_prec)
-
-        # Wait for 40 seconds before the next iteration
-        time.sleep(40)
-
-# Initialize Firestore client
-cred = credentials.Certificate("./utils/credentials.json")
-firebase_admin.initialize_app(cred, {
-    'databaseURL': 'https://chillinapp-a5b5b-default-rtdb.europe-west1.firebasedatabase.app/'
-    })
-db_firestore = firestore.client()
-
-# Invoke the main routine function to start processing data
-main_routine()
+    map = Map(DecimalGrid(MAP_GRID_DIGITS), metrics=metrics, timezone=MAP_TIMEZONE)
+    checkpoint = CheckpointStore(CHECKPOINT_PATH)
+    fetcher = None
+    if INGESTION_MODE == "listen":
+        # Receive new records as they are written, scored in micro-batches
+        try:
+            fetcher = RawDataListener(reference("account"), checkpoint)
+            fetcher.start()
+        except Exception as e:
+            logger.warning("Listening failed, falling back to polling: %s", e)
+            fetcher = None
+    if fetcher is None:
+        # Fetch only the records newer than the persisted checkpoint
+        fetcher = RawDataFetcher(reference("account"), checkpoint)
+    polling = isinstance(fetcher, RawDataFetcher)
+    # Create a DataProcessor object with the Firestore client 'db'
+    k = load_k(K_PATH)
+    processor = DataProcessor(db_firestore, fetcher, k, cleaner=SampleCleaner(RESAMPLE_PERIOD, MAX_FILL_GAP))
+    # Shard the accounts across worker processes, each one keeping the state of its accounts
+    pool = WorkerPool(db_firestore, SCORING_WORKERS, IO_WORKERS, STATE_PATH, k, STATE_IDLE_TTL) if SCORING_WORKERS > 0 else None
+    # Previous data of each email, loaded on first access and flushed before every checkpoint;
+    # with a pool it lives in the workers only
+    state_store = StateStore(SQLiteBackend(STATE_PATH), idle_ttl=STATE_IDLE_TTL) if pool is None else None
+
+    if METRICS_PORT is not None:
+        metrics.start_http_server(METRICS_PORT)
+    last_metrics_log = time.monotonic()
+
+    try:
+        # Infinite loop to continuously process data
+        while True:
+            cycle_start = time.perf_counter()
+            try:
+                if pool is None and STREAMING:
+                    # Score, map and write one account at a time instead of building each stage for every account
+                    processor.process_stream(state_store, map)
+                else:
+                    # Retrieve recent raw data from Firestore
+                    recent_raw_data = processor.get_recent_raw_data()
+
+                    if pool is not None:
+                        # Process raw data to derive meaningful information, in the worker processes
+                        with metrics.timer("create_derived_data"):
+                            derived_data = pool.create_derived_data(processor.adapt_recent_raw_data(recent_raw_data))
+                    else:
+                        # Process raw data to derive meaningful information, against the previous data of each email
+                        derived_data = processor.create_derived_data(processor.adapt_recent_raw_data(recent_raw_data), state_store)
+                        state_store.mark_dirty(recent_raw_data)
+                    # Extract derived data specific for Map
+                    extracted_data = processor.extract_derived_data_for_map(derived_data)
+                    # Parse extracted data into the Map object
+                    map.parse_derived_data(extracted_data)
+
+
+                    # Add derived data to Firestore
+                    if pool is not None:
+                        with metrics.timer("add_data_to_firestore"):
+                            pool.add_data_to_firestore(derived_data)
+                    else:
+                        processor.add_data_to_firestore(derived_data,data_prec)
+            except BatchWriteError as e:
+                # The writes stay queued for the next cycle, the records stay uncommitted so a restart fetches them again
+                logger.warning("Derived data not written, the checkpoint is not advanced: %s", e)
+            else:
+                # Persist the state of the accounts first, so the checkpoint never gets ahead of their baselines
+                if pool is not None:
+                    pool.flush_state()
+                else:
+                    state_store.flush()
+                # Remember the processed records so a restart does not process them again
+                fetcher.commit()
+                if state_store is not None:
+                    state_store.maybe_evict()
+
+            metrics.observe("cycle_seconds", time.perf_counter() - cycle_start)
+            metrics.increment("cycles")
+            if time.monotonic() - last_metrics_log >= METRICS_LOG_INTERVAL:
+                logger.info("metrics %s", metrics.to_json())
+                last_metrics_log = time.monotonic()
+
+            # When polling, wait before the next iteration; the listener already waits for new records
+            if polling:
+                time.sleep(POLL_INTERVAL)
+    finally:
+        # Stop the workers and the listener; the state was persisted with the last committed cycle
+        if pool is not None:
+            pool.shutdown()
+        if not polling:
+            fetcher.stop()
+
+# Worker processes import this module too, so start only when run as a script
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    # Invoke the main routine function to start processing data
+    main_routine()
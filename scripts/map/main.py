@@ -1,5 +1,6 @@
 # define a main that runs the job and tries to call function from the Map class
-from models.Map import Map
+# Run from the scripts directory: python -m map.main
+from map.models.Map import Map
 from datetime import datetime
 import time
 
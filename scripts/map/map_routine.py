@@ -1,64 +1,285 @@
-import firebase_admin
-import schedule
+# Run from the scripts directory: python -m map.map_routine
+import datetime
+import logging
 import time
-from firebase_admin import credentials
-from firebase_admin import db
-from firebase_admin import firestore
+from map.utils.firebase_app import delete_field, firestore_client, increment as firestore_increment, reference
 
-cred = credentials.Certificate("../utils/credentials.json")
-firebase_admin.initialize_app(cred, {
-    'databaseURL': 'https://chillinapp-a5b5b-default-rtdb.europe-west1.firebasedatabase.app/'
-    })
+PAGE_SIZE = 500  # Coordinates per page, one Firestore batch holds at most 500 writes
+SYNC_INTERVAL_MINUTES = 5  # Minutes between two syncs
+HOURLY_RETENTION_DAYS = 7  # Days whose hourly buckets are kept, older days keep only their total
+DAILY_RETENTION_DAYS = 90  # Days whose daily totals are kept, older ones are left to the weekly totals
+WEEKLY_RETENTION_WEEKS = 104  # Weeks whose weekly totals are kept
+COMPACTION_TIME = '03:00'  # Time of day the retention policy is applied
 
-db_firestore = firestore.client()
+logger = logging.getLogger(__name__)
 
-def job():
+def read_page(map_ref, after=None, page_size=PAGE_SIZE):
     """
-    This function is used to run the job that pushes the data from the Realtime Database to Firestore.
+    Read a page of coordinates from the Map node, ordered by key.
+
+    Args:
+        map_ref (Reference): The Map node of the Realtime Database.
+        after (str): The last key of the previous page, None for the first page.
+        page_size (int): The number of coordinates of the page.
 
     Returns:
-        None
+        dict: The coordinates of the page, keyed by coordinate key.
+    """
+    query = map_ref.order_by_key()
+    if after is not None:
+        # start_at is inclusive, ask for one more key and drop the already synced one if still there
+        page = query.start_at(after).limit_to_first(page_size + 1).get() or {}
+        page.pop(after, None)
+        return dict(list(page.items())[:page_size])
+    return query.limit_to_first(page_size).get() or {}
+
+def hour_scores(value):
+    """
+    Get the stress scores of a coordinate by day and hour.
+
+    Args:
+        value (dict): The coordinate node.
+
+    Returns:
+        dict: The stress score of each (day, hour).
+    """
+    scores = {}
+    for day, day_data in (value.get('days') or {}).items():
+        for hour, hour_data in (day_data.get('hours') or {}).items():
+            if hour_data.get('stress_score'):
+                scores[(day, hour)] = hour_data['stress_score']
+    return scores
+
+def week_of(day):
+    """
+    Get the ISO week of a day.
+
+    Args:
+        day (str): The day, as YYYY-MM-DD.
+
+    Returns:
+        str: The week, as YYYY-Www.
+    """
+    year, week, _ = datetime.date.fromisoformat(day).isocalendar()
+    return f'{year}-W{week:02d}'
+
+def merge_page(client, page, increment=firestore_increment):
     """
-    print('Running job')
-
-    # Retrieve the Map collection from the Realtime Database
-    map_ref = db.reference('Map')
-    map_data = map_ref.get()
-
-    if map_data is None:
-        return
-    
-    # Push the data to Firestore
-    for key, value in map_data.items():
-        print(key, value)
-        doc_ref = db_firestore.collection('Map').document(key)
-        
-        # Retrieve the existing document
-        existing_doc = doc_ref.get()
-        if existing_doc.exists:
-            # If the document exists, add the new stress_score to the existing one
-            existing_data = existing_doc.to_dict()
-            for day, day_data in value['days'].items():
-                for hour, hour_data in day_data['hours'].items():
-                    existing_score = existing_data['days'].get(day, {}).get('hours', {}).get(hour, {}).get('stress_score', 0)
-                    new_score = hour_data['stress_score']
-                    hour_data['stress_score'] = existing_score + new_score
-
-        doc_ref.set({
+    Merge the hour scores of a page into the Firestore Map collection in one batch.
+
+    The daily and weekly totals of each coordinate are incremented together with
+    its hours, so daily and weekly views read one field instead of summing hours.
+
+    Args:
+        client (Client): The Firestore client.
+        page (dict): The coordinates of the page.
+        increment (type): The increment transform used to add the scores on the server.
+
+    Returns:
+        dict: The committed stress scores of each coordinate.
+    """
+    batch = client.batch()
+    committed = {}
+    for key, value in page.items():
+        scores = hour_scores(value)
+        committed[key] = scores
+        if not scores:
+            continue
+        days = {}
+        day_totals = {}
+        week_totals = {}
+        for (day, hour), score in scores.items():
+            days.setdefault(day, {'hours': {}})['hours'][hour] = {
+                'hour': hour,
+                'stress_score': increment(score),
+            }
+            day_totals[day] = day_totals.get(day, 0) + score
+            week_totals[week_of(day)] = week_totals.get(week_of(day), 0) + score
+        for day, total in day_totals.items():
+            days[day]['stress_score'] = increment(total)
+        batch.set(client.collection('Map').document(key), {
             'lat': value['lat'],
             'long': value['long'],
-            'days': value['days']
+            'days': days,
+            'weeks': {week: {'stress_score': increment(total)} for week, total in week_totals.items()}
         }, merge=True)
+    if any(committed.values()):
+        batch.commit()
+    return committed
+
+def subtract_committed(current, scores):
+    """
+    Remove the committed scores from a coordinate node, keeping what was added meanwhile.
+
+    Args:
+        current (dict): The coordinate node as currently stored.
+        scores (dict): The committed stress score of each (day, hour).
+
+    Returns:
+        dict: The new coordinate node, None when nothing is left.
+    """
+    if current is None:
+        return None
+    days = current.get('days') or {}
+    for (day, hour), score in scores.items():
+        hours = (days.get(day) or {}).get('hours') or {}
+        if hour not in hours:
+            continue
+        left = hours[hour].get('stress_score', 0) - score
+        if left > 0:
+            hours[hour]['stress_score'] = left
+        else:
+            del hours[hour]
+        if not hours:
+            days.pop(day, None)
+    if not days:
+        return None
+    current['days'] = days
+    return current
+
+def compaction(document, today, hourly_days=HOURLY_RETENTION_DAYS, daily_days=DAILY_RETENTION_DAYS,
+               weekly_weeks=WEEKLY_RETENTION_WEEKS, delete=None):
+    """
+    Get the merge that applies the retention policy to a Firestore Map document.
+
+    Args:
+        document (dict): The document as currently stored.
+        today (date): The current day.
+        hourly_days (int): The days whose hourly buckets are kept.
+        daily_days (int): The days whose daily totals are kept.
+        weekly_weeks (int): The weeks whose weekly totals are kept.
+        delete (object): The sentinel that deletes a field in a merge.
+
+    Returns:
+        dict: The fields to merge, empty when the document is within the policy.
+    """
+    hourly_cutoff = (today - datetime.timedelta(days=hourly_days)).isoformat()
+    daily_cutoff = (today - datetime.timedelta(days=daily_days)).isoformat()
+    weekly_cutoff = week_of((today - datetime.timedelta(weeks=weekly_weeks)).isoformat())
+
+    days = {}
+    for day, day_data in (document.get('days') or {}).items():
+        if day < daily_cutoff:
+            days[day] = delete
+        elif day < hourly_cutoff and 'hours' in (day_data or {}):
+            days[day] = {'hours': delete}
+            if 'stress_score' not in day_data:
+                # days merged before the totals existed get theirs from the hours being dropped
+                days[day]['stress_score'] = sum(hour.get('stress_score', 0) for hour in (day_data['hours'] or {}).values())
+    weeks = {week: delete for week in (document.get('weeks') or {}) if week < weekly_cutoff}
+
+    update = {}
+    if days:
+        update['days'] = days
+    if weeks:
+        update['weeks'] = weeks
+    return update
+
+def compact(client=None, today=None, page_size=PAGE_SIZE, delete=None):
+    """
+    Apply the retention policy to every Firestore Map document.
+
+    Hourly buckets older than HOURLY_RETENTION_DAYS are folded into their daily totals,
+    daily totals older than DAILY_RETENTION_DAYS into the weekly ones, and weekly totals
+    older than WEEKLY_RETENTION_WEEKS are dropped, so documents stay bounded in size.
+
+    Args:
+        client (Client): The Firestore client, None uses the default one.
+        today (date): The current day, None uses the local date.
+        page_size (int): The number of documents written per batch.
+        delete (object): The sentinel that deletes a field in a merge, None uses DELETE_FIELD.
+
+    Returns:
+        int: The number of compacted documents.
+    """
+    client = client if client is not None else firestore_client()
+    today = today if today is not None else datetime.date.today()
+    delete = delete if delete is not None else delete_field()
+
+    compacted = 0
+    batch = client.batch()
+    pending = 0
+    for snapshot in client.collection('Map').stream():
+        update = compaction(snapshot.to_dict() or {}, today, delete=delete)
+        if not update:
+            continue
+        batch.set(client.collection('Map').document(snapshot.id), update, merge=True)
+        pending += 1
+        compacted += 1
+        if pending == page_size:
+            batch.commit()
+            batch = client.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+    logger.info('Compacted %d coordinates', compacted)
+    return compacted
+
+def job(map_ref=None, client=None, page_size=PAGE_SIZE, increment=firestore_increment):
+    """
+    This function is used to run the job that pushes the data from the Realtime Database to Firestore.
+
+    The Map node is drained in pages. Each page is merged into Firestore with increment
+    transforms in one batch, and only after the batch is committed the synced scores are
+    removed from the Realtime Database, so points written during the sync are kept.
+
+    Args:
+        map_ref (Reference): The Map node of the Realtime Database, None uses the default app.
+        client (Client): The Firestore client, None uses the default one.
+        page_size (int): The number of coordinates of each page.
+        increment (type): The increment transform used to add the scores on the server.
+
+    Returns:
+        int: The number of synced coordinates.
+    """
+    logger.info('Running job')
+    map_ref = map_ref if map_ref is not None else reference('Map')
+    client = client if client is not None else firestore_client()
+
+    synced = 0
+    after = None
+    while True:
+        page = read_page(map_ref, after, page_size)
+        if not page:
+            break
+
+        committed = merge_page(client, page, increment)
+
+        # Remove only what has been committed, atomically with respect to concurrent increments
+        for key, scores in committed.items():
+            map_ref.child(key).transaction(lambda current, scores=scores: subtract_committed(current, scores))
+        synced += len(committed)
+
+        after = list(page)[-1]
+        if len(page) < page_size:
+            break
+
+    logger.info('Synced %d coordinates', synced)
+    return synced
+
+
+def main():
+    """
+    Run the job at a fixed interval, forever.
+
+    Returns:
+        None
+    """
+    import schedule
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
 
-    # Clear the data from the Realtime Database
-    map_ref.delete()
+    # Schedule the job at a fixed interval, spreading reads and writes over the hour
+    schedule.every(SYNC_INTERVAL_MINUTES).minutes.do(job)
+    # Apply the retention policy once a day
+    schedule.every().day.at(COMPACTION_TIME).do(compact)
 
+    # Keep the script running
+    while True:
+        schedule.run_pending()
+        time.sleep(1)
 
-# Schedule the job to run every new hour
-schedule.every().hour.at(':00').do(job)
-# schedule.every(5).seconds.do(job)
 
-# Keep the script running
-while True:
-    schedule.run_pending()
-    time.sleep(1)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
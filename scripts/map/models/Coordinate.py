@@ -3,6 +3,8 @@ class Coordinate:
     This class is used to store the coordinates and their stress score.
     """
 
+    __slots__ = ('lat', 'long', 'days', 'stress_score')
+
     def __init__(self, lat, long):
         """
         Initialize a Coordinate object.
@@ -16,7 +18,7 @@ class Coordinate:
         """
         self.lat = lat
         self.long = long
-        self.days = []
+        self.days = {}
 
     def get_stress_score(self):
         """
@@ -64,7 +66,7 @@ class Coordinate:
         Returns:
             list: The days of the coordinate.
         """
-        return self.days
+        return list(self.days.values())
     
     def set_days(self, days):
         """
@@ -76,7 +78,7 @@ class Coordinate:
         Returns:
             None
         """
-        self.days = days
+        self.days = {day.get_day(): day for day in days}
 
     def add_day(self, day):
         """
@@ -88,7 +90,7 @@ class Coordinate:
         Returns:
             None
         """
-        self.days.append(day)
+        self.days[day.get_day()] = day
 
     def get_day(self, day):
         """
@@ -100,10 +102,7 @@ class Coordinate:
         Returns:
             Day: The day of the coordinate.
         """
-        for d in self.days:
-            if d.get_day() == day:
-                return d
-        return None
+        return self.days.get(day)
     
     def is_day(self, day):
         """
@@ -115,7 +114,4 @@ class Coordinate:
         Returns:
             bool: True if the day exists, False otherwise.
         """
-        for d in self.days:
-            if d.get_day() == day:
-                return True
-        return False
\ No newline at end of file
+        return day in self.days
\ No newline at end of file
@@ -1,32 +1,29 @@
 class Day:
 
+    __slots__ = ('day', 'hours')
+
     def __init__(self, day, hours):
         self.day = day
-        self.hours = hours
+        self.hours = {}
+        self.set_hours(hours)
 
     def get_day(self):
         return self.day
     
     def get_hours(self):
-        return self.hours
+        return list(self.hours.values())
 
     def set_day(self, day):
         self.day = day
 
     def set_hours(self, hours):
-        self.hours = hours
+        self.hours = {hour.get_hour(): hour for hour in hours}
 
     def add_hour(self, hour):
-        self.hours.append(hour)
+        self.hours[hour.get_hour()] = hour
 
     def get_hour(self, hour):
-        for record in self.hours:
-            if record.get_hour() == hour:
-                return record
-        return None
+        return self.hours.get(hour)
     
     def is_hour(self, hour):
-        for record in self.hours:
-            if record.get_hour() == hour:
-                return True
-        return False
+        return hour in self.hours
@@ -1,4 +1,6 @@
 class DerivedData:
+
+        __slots__ = ('lat', 'long', 'stress_score', 'timestamp')
     
         def __init__(self, lat, long, stress_score, timestamp):
             self.lat = lat
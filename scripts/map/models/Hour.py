@@ -1,5 +1,7 @@
 class Hour:
 
+    __slots__ = ('hour', 'stress_score')
+
     def __init__(self, hour, stress_score):
         self.hour = hour
         self.stress_score = stress_score
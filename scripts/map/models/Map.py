@@ -1,72 +1,117 @@
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import db
-import datetime
-from models.DerivedData import DerivedData
-from models.Hour import Hour
-from models.Day import Day
-from models.Coordinate import Coordinate
-
-cred = credentials.Certificate("../utils/credentials.json")
-firebase_admin.initialize_app(cred, {
-    'databaseURL': 'https://chillinapp-a5b5b-default-rtdb.europe-west1.firebasedatabase.app/'
-    })
+import contextlib
+from collections import Counter
+from map.models.Hour import Hour
+from map.models.Day import Day
+from map.models.Coordinate import Coordinate
+from map.utils.buckets import TimeBuckets
+from algorithms.storage import FirebaseStorage
 
 class Map:
     """
     This class is used to store the map of coordinates.
     """
 
-    def __init__(self):
+    def __init__(self, grid=None, map_ref=None, metrics=None, storage=None, timezone=None):
         """
         Initialize a Map object.
 
+        Args:
+            grid (DecimalGrid or GeohashGrid): The grid points are snapped to, None keeps exact coordinates.
+            map_ref (Reference): The 'Map' node of the real-time database, None uses the default app.
+            metrics (Metrics): The metrics the aggregation and the flush are timed in, None disables them.
+            storage (object): The storage the counts are added to with increment_hotspots, None uses Firebase at map_ref.
+            timezone (str or tzinfo): The timezone of the day and hour keys, None uses the server's local one.
+
         Returns:
             None
         """
-        self.map = []
+        self.map = {}
+        self.grid = grid
+        self.map_ref = map_ref
+        self.metrics = metrics
+        self.storage = storage if storage is not None else FirebaseStorage(None, map_ref=map_ref)
+        self.buckets = TimeBuckets(timezone)
+
+    def timer(self, name):
+        """
+        Time a block of code when metrics are set.
+
+        Args:
+            name (str): The name of the timer.
+
+        Returns:
+            contextmanager: The timer, or a no-op context.
+        """
+        return self.metrics.timer(name) if self.metrics is not None else contextlib.nullcontext()
+
+    def get_coordinate(self, lat, long):
+        """
+        Get the coordinate at the given position, creating it if it does not exist.
+
+        Args:
+            lat (float): The latitude coordinate.
+            long (float): The longitude coordinate.
+
+        Returns:
+            Coordinate: The coordinate.
+        """
+        coord = self.map.get((lat, long))
+        if coord is None:
+            coord = Coordinate(lat, long)
+            self.map[(lat, long)] = coord
+        return coord
+
+    def coordinate_key(self, coord):
+        """
+        Get the database key of a coordinate.
+
+        Args:
+            coord (Coordinate): The coordinate.
+
+        Returns:
+            str: The key, the grid cell key when a grid is set.
+        """
+        if self.grid is not None:
+            return self.grid.key(coord.get_lat(), coord.get_long())
+
+        # substitute dots with _ in the lat and long values
+        latitude_key = str(coord.get_lat()).replace('.', '_')
+        longitude_key = str(coord.get_long()).replace('.', '_')
+        return f'{latitude_key},{longitude_key}'
 
     def update_hotspots(self):
         """
-        Update the stress scores of coordinates in the real-time Firebase database.
+        Add the counts aggregated since the last flush to the stress scores of the storage.
+
+        The storage adds every hour score in one call. On Firebase it is a single multi-path
+        update with server-side increments, so concurrent workers cannot overwrite each
+        other's counts.
 
         Returns:
             None
         """
-        for coord in self.map:
-            # substitute dots with _ in the lat and long values
-            latitude_key = str(coord.get_lat()).replace('.', '_')
-            longitude_key = str(coord.get_long()).replace('.', '_')
-            
-            coord_ref = db.reference(f'Map/{latitude_key},{longitude_key}')
-            if coord_ref.get() is None:
-                coord_ref.set({
-                    'lat': coord.get_lat(),
-                    'long': coord.get_long(),
-                })
-                # If the coordinate does not exist in the database, create a new one
-                for day in coord.get_days():
-                    for hour in day.get_hours():
-                        coord_ref.child('days').child(day.get_day()).child('hours').child(hour.get_hour()).set({
-                            'hour': hour.get_hour(),
-                            'stress_score': hour.get_stress_score(),
-                        })
-            else:
-                # If the coordinate exists in the database, sum the existing score with the new one for each day and hour
-                for day in coord.get_days():
-                    for hour in day.get_hours():
-                        if coord_ref.child('days').child(day.get_day()).child('hours').child(hour.get_hour()).get() is None:
-                            coord_ref.child('days').child(day.get_day()).child('hours').child(hour.get_hour()).set({
-                                'hour': hour.get_hour(),
-                                'stress_score': hour.get_stress_score(),
-                            })
-                        else:
-                            coord_ref.child('days').child(day.get_day()).child('hours').child(hour.get_hour()).update({
-                                'stress_score': coord_ref.child('days').child(day.get_day()).child('hours').child(hour.get_hour()).get()['stress_score'] + hour.get_stress_score(),
-                            })
-        
-        self.map = []
-                
+        rows = self.hotspot_rows()
+        if rows:
+            with self.timer('update_hotspots'):
+                self.storage.increment_hotspots(rows)
+
+        self.map = {}
+
+    def hotspot_rows(self):
+        """
+        Get the counts aggregated since the last flush.
+
+        Returns:
+            list: The (coordinate key, lat, long, day, hour, count) of every hour.
+        """
+        rows = []
+        for coord in self.map.values():
+            coord_key = self.coordinate_key(coord)
+            for day in coord.get_days():
+                for hour in day.get_hours():
+                    rows.append((coord_key, coord.get_lat(), coord.get_long(), day.get_day(), hour.get_hour(), hour.get_stress_score()))
+        return rows
+
 
     def parse_derived_data(self, data):
         """
@@ -78,50 +123,51 @@ class Map:
         Returns:
             None
         """
-        
-        for derived_data in data:
-            derived_data = DerivedData(derived_data['lat'], derived_data['long'], derived_data['stress_score'], derived_data['timestamp'])
-
-            # get the YYYY-MM-DD part of the timestamp, which is expressed in milliseconds
-            day = derived_data.get_timestamp() / 1000
-            day = datetime.datetime.fromtimestamp(day)
-            day = day.strftime('%Y-%m-%d')
-
-            # get the HH part of the timestamp, which is expressed in milliseconds
-            hour = derived_data.get_timestamp() / 1000
-            hour = datetime.datetime.fromtimestamp(hour)
-            hour = hour.strftime('%H')
-            
-            found = False
-            for i in range(len(self.map)):
-                if self.map[i].get_lat() == derived_data.get_lat() and self.map[i].get_long() == derived_data.get_long():
-                    if derived_data.get_stress_score() > 0.6:
-
-                        if not self.map[i].is_day(day):
-                            self.map[i].add_day(Day(day, []))
-
-                        day = self.map[i].get_day(day)
-
-                        if not day.is_hour(hour):
-                            day.add_hour(Hour(hour, 0))
-                        
-                        hour = day.get_hour(hour)
-
-                        hour.set_stress_score(hour.get_stress_score() + 1)
-
-                    found = True
-                    break
-
-            if not found:
-                if derived_data.get_stress_score() > 0.6:
-                    coord = Coordinate(derived_data.get_lat(), derived_data.get_long())
-                    coord.add_day(Day(day, []))
-                    day = coord.get_day(day)
-                    day.add_hour(Hour(hour, 1))
-                    self.map.append(coord)
-        
+        with self.timer('parse_derived_data'):
+            self.aggregate(data)
+
         self.update_hotspots()
 
+    def aggregate(self, data):
+        """
+        Add the stressful points of derived data to the map of coordinates.
+
+        Args:
+            data (list): A list of dictionaries containing coordinate data.
+
+        Returns:
+            None
+        """
+        points = [derived_data for derived_data in data if derived_data['stress_score'] > 0.6]
+        if not points:
+            return
+
+        # get the local YYYY-MM-DD and HH of every timestamp in one pass
+        days, hours = self.buckets.keys([derived_data['timestamp'] for derived_data in points])
+
+        counts = Counter()
+        for derived_data, day, hour in zip(points, days, hours):
+            lat, long = derived_data['lat'], derived_data['long']
+            if self.grid is not None:
+                # snap the point to its cell, so nearby GPS fixes share one coordinate
+                lat, long = self.grid.snap(lat, long)
+            counts[(lat, long, day, hour)] += 1
+
+        for (lat, long, day, hour), count in counts.items():
+            coord = self.get_coordinate(lat, long)
+
+            if not coord.is_day(day):
+                coord.add_day(Day(day, []))
+
+            day = coord.get_day(day)
+
+            if not day.is_hour(hour):
+                day.add_hour(Hour(hour, 0))
+
+            hour = day.get_hour(hour)
+
+            hour.set_stress_score(hour.get_stress_score() + count)
+
     def print_map(self):
         """
         Print the map of coordinates.
@@ -0,0 +1,111 @@
+import datetime
+import sys
+import zoneinfo
+import numpy as np
+
+MS_PER_HOUR = 3600 * 1000
+MS_PER_DAY = 24 * MS_PER_HOUR
+HOURS = tuple(f'{hour:02d}' for hour in range(24))
+
+# epoch timestamps below these bounds are read in the unit of the same row
+EPOCH_UNITS = (
+    (1e11, 1000),       # seconds, 1e11 s is the year 5138
+    (1e14, 1),          # milliseconds
+    (1e17, 1e-3),       # microseconds
+    (np.inf, 1e-6),     # nanoseconds
+)
+
+
+def to_milliseconds(timestamps):
+    """
+    Convert epoch timestamps to milliseconds, detecting the unit of each one.
+
+    Args:
+        timestamps (array): The timestamps, in seconds, milliseconds, microseconds or nanoseconds.
+
+    Returns:
+        ndarray: The timestamps in milliseconds, as int64.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    magnitude = np.abs(timestamps)
+    factors = np.select([magnitude < bound for bound, _ in EPOCH_UNITS], [factor for _, factor in EPOCH_UNITS])
+    return np.floor(timestamps * factors).astype(np.int64)
+
+
+class TimeBuckets:
+    """
+    This class converts batches of epoch timestamps to (day, hour) keys in a timezone.
+    """
+
+    def __init__(self, timezone=None):
+        """
+        Initialize a TimeBuckets object.
+
+        Args:
+            timezone (str or tzinfo): The timezone of the keys, e.g. 'Europe/Rome', None uses the server's local one.
+
+        Returns:
+            None
+        """
+        self.timezone = zoneinfo.ZoneInfo(timezone) if isinstance(timezone, str) else timezone
+        self.day_keys = {}
+        self.offsets = {}
+
+    def utc_offset(self, utc_hour):
+        """
+        Get the offset of the timezone during an hour, cached per hour.
+
+        Args:
+            utc_hour (int): The hour, as hours since the epoch in UTC.
+
+        Returns:
+            int: The offset in milliseconds.
+        """
+        offset = self.offsets.get(utc_hour)
+        if offset is None:
+            moment = datetime.datetime.fromtimestamp(utc_hour * 3600, datetime.timezone.utc)
+            local = moment.astimezone(self.timezone) if self.timezone is not None else moment.astimezone()
+            offset = self.offsets[utc_hour] = int(local.utcoffset().total_seconds() * 1000)
+        return offset
+
+    def day_key(self, day_number):
+        """
+        Get the interned YYYY-MM-DD string of a day, cached per day.
+
+        Args:
+            day_number (int): The day, as days since the epoch.
+
+        Returns:
+            str: The day.
+        """
+        key = self.day_keys.get(day_number)
+        if key is None:
+            key = self.day_keys[day_number] = sys.intern(str(np.datetime64(day_number, 'D')))
+        return key
+
+    def keys(self, timestamps):
+        """
+        Get the local day and hour of every timestamp.
+
+        Offsets are looked up once per distinct hour and day strings once per distinct
+        day, so a batch allocates no datetime object and no string per sample.
+
+        Args:
+            timestamps (array): The epoch timestamps, in any unit.
+
+        Returns:
+            tuple: The list of days (YYYY-MM-DD) and the list of hours (HH).
+        """
+        milliseconds = to_milliseconds(timestamps)
+        if len(milliseconds) == 0:
+            return [], []
+
+        utc_hours, hour_index = np.unique(milliseconds // MS_PER_HOUR, return_inverse=True)
+        offsets = np.array([self.utc_offset(int(hour)) for hour in utc_hours], dtype=np.int64)
+        local = milliseconds + offsets[hour_index.ravel()]
+
+        day_numbers, day_index = np.unique(local // MS_PER_DAY, return_inverse=True)
+        day_strings = [self.day_key(int(day)) for day in day_numbers]
+        hours = (local % MS_PER_DAY) // MS_PER_HOUR
+
+        return [day_strings[i] for i in day_index.ravel()], [HOURS[hour] for hour in hours]
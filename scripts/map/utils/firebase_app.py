@@ -0,0 +1,95 @@
+import os
+import threading
+
+DATABASE_URL = 'https://chillinapp-a5b5b-default-rtdb.europe-west1.firebasedatabase.app/'
+# the service account key, next to this file unless CHILLIN_CREDENTIALS points elsewhere
+CREDENTIALS_PATH = os.environ.get('CHILLIN_CREDENTIALS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'credentials.json'))
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def get_app():
+    """
+    Get the Firebase app of the process, initializing it on first use.
+
+    The SDK is imported and the credentials are loaded only here, so modules that
+    never talk to Firebase import quickly. The app is looked up in the SDK's own
+    registry, so importing this module under two names cannot initialize it twice.
+
+    Returns:
+        App: The default Firebase app.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            cred = credentials.Certificate(CREDENTIALS_PATH)
+            return firebase_admin.initialize_app(cred, {'databaseURL': DATABASE_URL})
+
+
+def reference(path='/'):
+    """
+    Get a reference to a node of the Realtime Database.
+
+    Args:
+        path (str): The path of the node.
+
+    Returns:
+        Reference: The reference to the node.
+    """
+    from firebase_admin import db
+
+    return db.reference(path, app=get_app())
+
+
+def firestore_client():
+    """
+    Get the Firestore client of the process, created on first use.
+
+    Clients are kept per process id, since a client created before a fork must
+    not be used by the child. The client is created under the lock, so threads
+    asking for it at the same time share one.
+
+    Returns:
+        Client: The Firestore client.
+    """
+    from firebase_admin import firestore
+
+    app = get_app()
+    pid = os.getpid()
+    with _lock:
+        client = _clients.get(pid)
+        if client is None:
+            client = _clients[pid] = firestore.client(app=app)
+    return client
+
+
+def delete_field():
+    """
+    Get the Firestore sentinel that deletes a field in a merge.
+
+    Returns:
+        Sentinel: The DELETE_FIELD sentinel.
+    """
+    from firebase_admin import firestore
+
+    return firestore.DELETE_FIELD
+
+
+def increment(value):
+    """
+    Get a Firestore transform that adds value to a field on the server.
+
+    Args:
+        value (int): The value to add.
+
+    Returns:
+        Increment: The transform.
+    """
+    from firebase_admin import firestore
+
+    return firestore.Increment(value)
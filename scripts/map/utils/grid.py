@@ -0,0 +1,148 @@
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+class DecimalGrid:
+    """
+    This class snaps coordinates to a grid with a fixed number of decimal digits.
+    """
+
+    def __init__(self, digits=4):
+        """
+        Initialize a DecimalGrid object.
+
+        Args:
+            digits (int): The decimal digits kept, 4 digits are cells of about 11 meters.
+
+        Returns:
+            None
+        """
+        self.digits = digits
+
+    def snap(self, lat, long):
+        """
+        Get the cell of a point.
+
+        Args:
+            lat (float): The latitude of the point.
+            long (float): The longitude of the point.
+
+        Returns:
+            tuple: The latitude and longitude of the cell.
+        """
+        return round(lat, self.digits), round(long, self.digits)
+
+    def key(self, lat, long):
+        """
+        Get the database key of a cell.
+
+        Args:
+            lat (float): The latitude of the cell.
+            long (float): The longitude of the cell.
+
+        Returns:
+            str: The key of the cell, with dots replaced by underscores.
+        """
+        return f'{lat:.{self.digits}f},{long:.{self.digits}f}'.replace('.', '_')
+
+
+class GeohashGrid:
+    """
+    This class snaps coordinates to geohash cells.
+    """
+
+    def __init__(self, precision=7):
+        """
+        Initialize a GeohashGrid object.
+
+        Args:
+            precision (int): The geohash length, 7 characters are cells of about 150x150 meters.
+
+        Returns:
+            None
+        """
+        self.precision = precision
+
+    def encode(self, lat, long):
+        """
+        Get the geohash of a point.
+
+        Args:
+            lat (float): The latitude of the point.
+            long (float): The longitude of the point.
+
+        Returns:
+            str: The geohash.
+        """
+        lat_range = [-90.0, 90.0]
+        long_range = [-180.0, 180.0]
+        geohash = []
+        bits = 0
+        bit_count = 0
+        even = True
+        while len(geohash) < self.precision:
+            value, bounds = (long, long_range) if even else (lat, lat_range)
+            middle = (bounds[0] + bounds[1]) / 2
+            if value >= middle:
+                bits = bits * 2 + 1
+                bounds[0] = middle
+            else:
+                bits = bits * 2
+                bounds[1] = middle
+            even = not even
+            bit_count += 1
+            if bit_count == 5:
+                geohash.append(BASE32[bits])
+                bits = 0
+                bit_count = 0
+        return ''.join(geohash)
+
+    def decode(self, geohash):
+        """
+        Get the center of a geohash cell.
+
+        Args:
+            geohash (str): The geohash.
+
+        Returns:
+            tuple: The latitude and longitude of the center of the cell.
+        """
+        lat_range = [-90.0, 90.0]
+        long_range = [-180.0, 180.0]
+        even = True
+        for char in geohash:
+            bits = BASE32.index(char)
+            for shift in range(4, -1, -1):
+                bounds = long_range if even else lat_range
+                middle = (bounds[0] + bounds[1]) / 2
+                if bits >> shift & 1:
+                    bounds[0] = middle
+                else:
+                    bounds[1] = middle
+                even = not even
+        return (lat_range[0] + lat_range[1]) / 2, (long_range[0] + long_range[1]) / 2
+
+    def snap(self, lat, long):
+        """
+        Get the cell of a point.
+
+        Args:
+            lat (float): The latitude of the point.
+            long (float): The longitude of the point.
+
+        Returns:
+            tuple: The latitude and longitude of the center of the cell.
+        """
+        return self.decode(self.encode(lat, long))
+
+    def key(self, lat, long):
+        """
+        Get the database key of a cell.
+
+        Args:
+            lat (float): The latitude of the cell.
+            long (float): The longitude of the cell.
+
+        Returns:
+            str: The geohash of the cell.
+        """
+        return self.encode(lat, long)
@@ -0,0 +1,5 @@
+# The tests import the scripts the way they are run, from the scripts directory
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
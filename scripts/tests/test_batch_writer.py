@@ -0,0 +1,42 @@
+import pytest
+
+from algorithms.batch_writer import BatchWriteError, BatchWriter
+from fakes.firestore import FakeFirestore
+
+
+class FlakyFirestore(FakeFirestore):
+    """
+    A FakeFirestore whose batch commits fail while `down` is set.
+    """
+
+    down = True
+
+    def batch(self):
+        batch = super().batch()
+        commit = batch.commit
+
+        def flaky_commit():
+            if self.down:
+                raise ConnectionError("Firestore unavailable")
+            commit()
+
+        batch.commit = flaky_commit
+        return batch
+
+
+def test_failed_batches_raise_and_stay_queued():
+    client = FlakyFirestore()
+    writer = BatchWriter(client, batch_size=2, retry_delay=0)
+    collection = client.collection("DerivedData")
+    for i in range(3):
+        writer.operations.append((collection.document(str(i)), {"value": i}, False))
+
+    with pytest.raises(BatchWriteError):
+        writer.flush()
+    assert len(writer.operations) == 3
+    assert client.documents == {}
+
+    client.down = False
+    writer.flush()
+    assert sorted(client.documents) == ["DerivedData/0", "DerivedData/1", "DerivedData/2"]
+    assert writer.operations == []
@@ -0,0 +1,13 @@
+from benchmark.run_benchmark import STAGES, run_scale
+
+
+def test_run_scale_completes():
+    # The first four cycles fill the baselines, the last four are scored
+    result = run_scale(10, 8)
+
+    assert result["samples"] == 10 * 30 * 8
+    assert result["derived_samples"] > 0
+    assert result["samples_per_second"] > 0
+    assert result["peak_memory_bytes"] > 0
+    for stage in STAGES:
+        assert result["stages"][stage]["total_ms"] > 0
@@ -0,0 +1,20 @@
+from algorithms.metrics import BYTES_SAMPLE_EVERY, Metrics
+
+
+def test_firebase_call_estimates_bytes_from_sampled_payloads():
+    registry = Metrics()
+    for _ in range(2 * BYTES_SAMPLE_EVERY):
+        registry.firebase_call("commit", {"a": 1})
+    assert registry.counters["firebase_commit_calls"] == 2 * BYTES_SAMPLE_EVERY
+    assert registry.counters["firebase_commit_bytes_estimated"] == 2 * BYTES_SAMPLE_EVERY * len('{"a": 1}')
+
+
+def test_drained_worker_metrics_merge_into_the_parent():
+    worker, parent = Metrics(), Metrics()
+    worker.increment("derived_samples", 3)
+    worker.observe("score_shard_seconds", 0.5)
+    parent.increment("derived_samples", 1)
+    parent.merge(worker.drain())
+    assert parent.counters["derived_samples"] == 4
+    assert parent.histograms["score_shard_seconds"].count == 1
+    assert worker.counters == {} and worker.histograms == {}
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from algorithms.data_manipulation import DataProcessor
+from algorithms.state_store import AccountState, MemoryBackend, SQLiteBackend, StateStore
+
+
+def idle_store(backend):
+    store = StateStore(backend, idle_ttl=0.0)
+    store.get("idle@example.com").last_timestamp = 5
+    store.mark_dirty(["idle@example.com"])
+    store.flush()
+    time.sleep(0.001)
+    assert store.evict_idle() == ["idle@example.com"]
+    return store
+
+
+def test_memory_backend_forgets_evicted_states():
+    store = idle_store(MemoryBackend())
+    assert "idle@example.com" not in store
+    assert store.backend.states == {}
+
+
+def test_persistent_backend_keeps_evicted_states(tmp_path):
+    store = idle_store(SQLiteBackend(str(tmp_path / "state.sqlite")))
+    assert store.get("idle@example.com").last_timestamp == 5
+
+
+def test_score_accounts_requires_a_state_store():
+    with pytest.raises(TypeError):
+        DataProcessor(None, storage=object()).score_accounts({}, {"a@example.com": AccountState()})
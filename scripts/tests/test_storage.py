@@ -0,0 +1,92 @@
+import pytest
+
+from algorithms.data_manipulation import DataProcessor
+from algorithms.range_based import BayesianAnalyzer
+from algorithms.raw_data_fetcher import RawDataFetcher
+from algorithms.state_store import StateStore
+from algorithms.storage import MemoryStorage, SQLiteStorage
+from benchmark.synthetic import SyntheticWearables
+from fakes.firestore import FakeFirestore
+from fakes.realtime_database import FakeDatabase
+from map.models.Map import Map
+from map.utils.grid import DecimalGrid
+
+
+def replay(storage, n_accounts=5, cycles=8, seed=3):
+    """
+    Run the pipeline on the same synthetic cycles with one storage.
+
+    Returns the DerivedData of each email and the Map count of each (coordinate, day, hour).
+    """
+    wearables = SyntheticWearables(n_accounts, seed, episode_probability=0.5)
+    database = FakeDatabase()
+    client = FakeFirestore()
+    local = None
+    if storage == "fakes":
+        processor = DataProcessor(client, RawDataFetcher(database.reference("account")))
+    else:
+        local = MemoryStorage() if storage == "memory" else SQLiteStorage(":memory:")
+        processor = DataProcessor(None, storage=local)
+    processor.range_based = BayesianAnalyzer(seed=0)  # Same posterior draws with every storage
+    states = StateStore()
+    hotspots = Map(DecimalGrid(4), database.reference("Map"), storage=local, timezone="Europe/Rome")
+
+    for _ in range(cycles):
+        if local is None:
+            database.reference("account").update(wearables.next_account_node())
+        else:
+            local.add_raw_data(wearables.next_account_node())
+        raw_data = processor.get_recent_raw_data()
+        derived_data = processor.create_derived_data(processor.adapt_recent_raw_data(raw_data), states)
+        hotspots.parse_derived_data(processor.extract_derived_data_for_map(derived_data))
+        processor.add_data_to_firestore(derived_data, {})
+        processor.fetcher.commit()
+
+    if storage == "fakes":
+        derived = {}
+        for path, document in client.documents.items():
+            _, email, _, timestamp = path.split("/")
+            derived.setdefault(email, {})[timestamp] = (*document["binterval"], document["stress_score"])
+        counts = {
+            (coordinate, day, hour): hour_data["stress_score"]
+            for coordinate, node in (database.data.get("Map") or {}).items()
+            for day, day_data in node["days"].items()
+            for hour, hour_data in day_data["hours"].items()
+        }
+    elif storage == "memory":
+        derived = {
+            email: {timestamp: (*document["binterval"], document["stress_score"]) for timestamp, document in documents.items()}
+            for email, documents in local.derived_data.items()
+        }
+        counts = dict(local.hotspots)
+    else:
+        derived = {}
+        for email, timestamp, lower, upper, score in local.connection.execute(
+                "SELECT account, timestamp, lower_bound, upper_bound, stress_score FROM derived_data"):
+            derived.setdefault(email, {})[str(timestamp)] = (lower, upper, score)
+        counts = {(coordinate, day, hour): score for coordinate, day, hour, score in local.connection.execute(
+            "SELECT coordinate, day, hour, stress_score FROM hotspot")}
+    return derived, counts
+
+
+def test_backends_write_the_same_data():
+    derived, counts = replay("fakes")
+
+    # The last cycles are scored and some of them are stressful
+    assert sum(len(documents) for documents in derived.values()) > 0
+    assert sum(counts.values()) > 0
+    for storage in ("memory", "sqlite"):
+        assert replay(storage) == (derived, counts)
+
+
+@pytest.mark.parametrize("storage", [MemoryStorage, lambda: SQLiteStorage(":memory:")])
+def test_fetch_returns_only_accounts_with_new_records(storage):
+    local = storage()
+    local.add_raw_data({"a": {"RawData": {"1": {"timestamp": 1}}}, "b": {"RawData": {"1": {"timestamp": 1}}}})
+    assert set(local.fetch()) == {"a", "b"}
+    local.commit()
+
+    local.add_raw_data({"a": {"RawData": {"2": {"timestamp": 2}}}})
+    assert local.fetch() == {"a": {"RawData": {"2": {"timestamp": 2}}}}
+    local.commit()
+    assert local.fetch() == {}